@@ -1,9 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.schemas.user import UserCreate, TokenRefreshRequest, TokenLogoutRequest
-from app.utils.jwt import create_access_token, decode_access_token, create_refresh_token
-from app.core.security import get_password_hash, verify_password
+from app.utils.jwt import create_access_token, decode_access_token
+from app.core.security import get_password_hash_async, password_needs_rehash, verify_password_async
+from app.core.config import AUTH_EPOCH_CACHE_MAX_SIZE, AUTH_EPOCH_CACHE_TTL_SECONDS, AUTH_STATELESS
+from app.crud.roles import compact_permissions, get_role_permissions
 from app.database import get_db
+from app.services.refresh_tokens import RefreshTokenError, issue_refresh_token, revoke_refresh_token, rotate_refresh_token
+from app.utils.cache import TTLCache
 from app.models.user import User
 from pymongo.errors import DuplicateKeyError
 from jose import JWTError
@@ -12,6 +16,33 @@ import datetime
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# email -> current token_epoch (None if the user no longer exists)
+token_epoch_cache = TTLCache(maxsize=AUTH_EPOCH_CACHE_MAX_SIZE, ttl=AUTH_EPOCH_CACHE_TTL_SECONDS)
+_NOT_CACHED = object()
+
+
+async def get_token_epoch(db, email: str):
+    epoch = token_epoch_cache.get(email, _NOT_CACHED)
+    if epoch is _NOT_CACHED:
+        user = await db["users"].find_one({"email": email}, {"_id": 0, "token_epoch": 1})
+        epoch = user.get("token_epoch", 0) if user is not None else None
+        token_epoch_cache.set(email, epoch)
+    return epoch
+
+
+async def access_token_claims(db, user: dict) -> dict:
+    # Stateless mode only: everything PermissionChecker needs, embedded in the token
+    if not AUTH_STATELESS:
+        return {}
+    role = user.get("role_id")
+    permissions = await get_role_permissions(db, role) if role else None
+    return {
+        "role": role,
+        "active": user.get("is_active", True),
+        "perms": compact_permissions(permissions),
+        "epoch": user.get("token_epoch", 0),
+    }
+
 
 @router.post("/register")
 async def register(user: UserCreate):
@@ -22,7 +53,7 @@ async def register(user: UserCreate):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     user_dict = {
         "email": user.email,
         "hashed_password": hashed_password,
@@ -43,23 +74,18 @@ async def register(user: UserCreate):
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     db = get_db()
     users = db["users"]
-    refresh_tokens = db["refresh_tokens"]
 
     user = await users.find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    if not user or not await verify_password_async(form_data.password, user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    access_token = create_access_token({"sub": user["email"]})
-    refresh_token, expires_at = create_refresh_token({"sub": user["email"]})
+    # Upgrade the stored hash when BCRYPT_ROUNDS changed since it was created
+    if password_needs_rehash(user["hashed_password"]):
+        new_hash = await get_password_hash_async(form_data.password)
+        await users.update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
 
-    
-    await refresh_tokens.insert_one({
-        "token": refresh_token,
-        "email": user["email"],
-        "created_at": datetime.datetime.utcnow(),
-        "expires_at": expires_at,
-        "revoked": False
-    })
+    access_token = create_access_token({"sub": user["email"]}, extra_claims=await access_token_claims(db, user))
+    refresh_token = await issue_refresh_token(db, user["email"])
 
     return {
         "access_token": access_token,
@@ -72,7 +98,6 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 @router.post("/refresh")
 async def refresh_token(payload: TokenRefreshRequest):
     db = get_db()
-    refresh_tokens = db["refresh_tokens"]
     token = payload.refresh_token
 
     # Step 1: Decode and validate structure
@@ -80,41 +105,21 @@ async def refresh_token(payload: TokenRefreshRequest):
         payload = decode_access_token(token)
         if payload.get("type") != "refresh":
             raise HTTPException(status_code=400, detail="Invalid token type")
-        email = payload.get("sub")
+        email = payload.get("email")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
 
-    # Step 2: Check DB for token status
-    token_doc = await refresh_tokens.find_one({
-        "token": token,
-        "email": email,
-        "revoked": False
-    })
-
-    if not token_doc:
-        raise HTTPException(status_code=401, detail="Token not found or already revoked")
-
-    if token_doc["expires_at"] < datetime.datetime.utcnow():
-        await refresh_tokens.update_one({"_id": token_doc["_id"]}, {"$set": {"revoked": True}})
-        raise HTTPException(status_code=401, detail="Refresh token expired")
-
-    # Step 3: Revoke the old token
-    await refresh_tokens.update_one(
-        {"_id": token_doc["_id"]},
-        {"$set": {"revoked": True}}
-    )
-
-    # Step 4: Issue new tokens
-    new_access_token = create_access_token({"sub": email})
-    new_refresh_token, new_expiry = create_refresh_token({"sub": email})
+    # Step 2: Revoke the presented token and issue its successor in one step
+    try:
+        new_refresh_token = await rotate_refresh_token(db, token, email)
+    except RefreshTokenError as exc:
+        raise HTTPException(status_code=401, detail=exc.detail)
 
-    await refresh_tokens.insert_one({
-        "token": new_refresh_token,
-        "email": email,
-        "created_at": datetime.datetime.utcnow(),
-        "expires_at": new_expiry,
-        "revoked": False
-    })
+    # Step 3: Issue a new access token (re-reading the user so role changes are picked up)
+    user = await db["users"].find_one({"email": email})
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    new_access_token = create_access_token({"sub": email}, extra_claims=await access_token_claims(db, user))
 
     return {
         "access_token": new_access_token,
@@ -125,14 +130,8 @@ async def refresh_token(payload: TokenRefreshRequest):
 @router.post("/logout")
 async def logout(payload: TokenLogoutRequest):
     db = get_db()
-    refresh_token = payload.refresh_token
 
-    result = await db["refresh_tokens"].update_one(
-        {"token": refresh_token},
-        {"$set": {"revoked": True}}
-    )
-
-    if result.modified_count == 0:
+    if not await revoke_refresh_token(db, payload.refresh_token):
         raise HTTPException(status_code=404, detail="Token not found or already revoked")
 
     return {"message": "Logged out successfully"}
@@ -156,6 +155,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
 
+    # Stateless tokens authorize from their claims; only the (cached) epoch is checked
+    if AUTH_STATELESS and "perms" in payload:
+        if not payload.get("active", True) or payload.get("epoch", 0) != await get_token_epoch(db, email):
+            raise credentials_exception
+        return {
+            "email": email,
+            "role_id": payload.get("role"),
+            "is_active": True,
+            "token_permissions": payload["perms"],
+        }
+
     user = await users_col.find_one({"email": email})
     if user is None:
         raise credentials_exception
@@ -8,8 +8,11 @@ from app.utils.diff import diff_versions
 from app.services.collab import CollaborationManager
 from app.core.permissions import ensure_collaborator
 from fastapi import WebSocket, WebSocketDisconnect
+from pymongo import ReturnDocument
 from app.models.collaboration import ShareEventRequest, ShareUser, PermissionUpdatePayload
 from app.core.permissions import PermissionChecker
+from app.services.access import sync_event_access
+from app.services.invalidation import events_changed
 
 router = APIRouter()
 
@@ -45,12 +48,14 @@ async def share_event(
     if not new_collaborators:
         raise HTTPException(status_code=400, detail="No new users to share with")
 
-    await db["events"].update_one(
+    updated_event = await db["events"].find_one_and_update(
         {"_id": ObjectId(event_id)},
-        {"$push": {"collaborators": {"$each": new_collaborators}}}
+        {"$push": {"collaborators": {"$each": new_collaborators}}, "$set": {"updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
     )
-
-    updated_event = await db["events"].find_one({"_id": ObjectId(event_id)})
+    # the whole event: the owner's and existing collaborators' lists show the collaborators too
+    events_changed(updated_event)
+    await sync_event_access(db, updated_event)
     return {
         "message": "Event shared successfully",
         "collaborators": updated_event.get("collaborators", [])
@@ -142,12 +147,15 @@ async def update_event_collaborator_role(
         raise HTTPException(status_code=400, detail="New role is same as current role")
     
     # Update the role in collaborators array
-    result = await db["events"].update_one(
+    updated_event = await db["events"].find_one_and_update(
         {"_id": ObjectId(event_id), "collaborators.user_id": user_id},
-        {"$set": {"collaborators.$.role": new_role, "updated_at": datetime.utcnow()}}
+        {"$set": {"collaborators.$.role": new_role, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
     )
-    if result.modified_count == 0:
+    if updated_event is None:
         raise HTTPException(status_code=400, detail="Update failed")
+    events_changed(updated_event)
+    await sync_event_access(db, updated_event)
 
     return {"message": f"Role updated to '{new_role}' for user {user_id}"}
 
@@ -180,10 +188,15 @@ async def remove_collaborator(
         raise HTTPException(status_code=404, detail="User not found in collaborators")
 
     # Remove collaborator
-    await events.update_one(
+    updated_event = await events.find_one_and_update(
         {"_id": ObjectId(event_id)},
-        {"$pull": {"collaborators": {"user_id": user_id}}}
+        {"$pull": {"collaborators": {"user_id": user_id}}, "$set": {"updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
     )
+    # before and after: the removed user's lists change as well as everyone else's
+    events_changed(event, updated_event or {})
+    if updated_event:
+        await sync_event_access(db, updated_event)
 
 
     return {"message": f"Access removed for user {user_id}"}
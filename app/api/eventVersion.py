@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from bson import ObjectId
 from datetime import datetime
 from typing import List, Optional
@@ -7,43 +7,61 @@ from app.api.auth import get_current_user
 from app.database import get_db
 from app.utils.diff import diff_versions
 from app.services.collab import CollaborationManager
+from app.services.access import sync_event_access
+from app.services.invalidation import events_changed
 from app.core.permissions import ensure_collaborator
 from fastapi import WebSocket, WebSocketDisconnect
 from app.core.permissions import PermissionChecker
+from app.services.versioning import VersionWriteError, get_version_diff, iter_version_states, latest_version_id, load_version_data, record_change
+from app.utils.etag import etag_matches, make_etag, not_modified
+from app.utils.responses import BSONResponse
+from app.utils.streaming import ndjson_response, wants_ndjson
 
 import json
 
 router = APIRouter()
 
 
-@router.get("/events/{event_id}/history/{version_id}")
+async def _history_etag(db, event_id: str, *variant) -> str:
+    # history only grows, so the newest version id identifies its state
+    return make_etag("history", event_id, await latest_version_id(db, event_id), *variant)
+
+
+@router.get("/events/{event_id}/history/{version_id}", response_class=BSONResponse)
 async def get_event_version(
     event_id: str,
     version_id: str,
+    request: Request,
     current_user: dict = Depends(get_current_user),
     auth=Depends(PermissionChecker("events", "GET") )
 ):
     db = get_db()
+    if not ObjectId.is_valid(version_id):
+        raise HTTPException(status_code=404, detail="Version not found")
+    query = {"_id": ObjectId(version_id), "event_id": event_id}
 
-    version = await db["event_versions"].find_one({
-        "_id": ObjectId(version_id),
-        "event_id": event_id
-    })
+    # a version never changes once written, so the ids identify it; only its existence is checked
+    etag = make_etag("version", event_id, version_id)
+    if etag_matches(request.headers.get("if-none-match"), etag, weak=True):
+        if not await db["event_versions"].find_one(query, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Version not found")
+        return not_modified(etag)
+
+    version = await db["event_versions"].find_one(query)
 
     if not version:
         raise HTTPException(status_code=404, detail="Version not found")
 
-    # Format the output (convert _id and timestamp)
-    version["_id"] = str(version["_id"])
-    if "timestamp" in version:
-        version["timestamp"] = version["timestamp"].isoformat()
+    # Resolve delta-compressed versions into a full snapshot
+    version["data"] = await load_version_data(db, version)
+    version.pop("delta", None)
 
-    return {
+    return BSONResponse({
         "event_id": event_id,
         "version": version
-    }
+    }, headers={"ETag": etag})
 
-@router.post("/events/{event_id}/rollback/{version_id}")
+@router.post("/events/{event_id}/rollback/{version_id}", response_class=BSONResponse)
 async def rollback_event_version(
     event_id: str,
     version_id: str,
@@ -75,27 +93,19 @@ async def rollback_event_version(
     current_snapshot["_id"] = str(current_snapshot["_id"])
  
 
-    rollback_data = version.get("data", {}).copy()
+    rollback_data = (await load_version_data(db, version)).copy()
     rollback_data.pop("_id", None)
-    rollback_data["updated_at"] = datetime.utcnow()
+    now = datetime.utcnow()
+    # BSON dates keep milliseconds; record_change matches the write on this value
+    rollback_data["updated_at"] = now.replace(microsecond=now.microsecond // 1000 * 1000)
     # print(rollback_data)
 
     diff = diff_versions(current_snapshot, rollback_data)
     # print(diff)
     # diff = json.loads(DeepDiff(current_snapshot, rollback_data, ignore_order=True).to_json())
 
-    await versions.insert_one({
-        "event_id": event_id,
-        "change_type": "rollback",
-        "data": current_snapshot,
-        "diff": diff,
-        "changed_by": current_user["email"],
-        "timestamp": datetime.utcnow(),
-        "reason": f"Rollback to version {version_id}"
-    })
-
     # print(ObjectId(event_id))
-    # Apply rollback
+    # Apply rollback, then back up the state it replaced; a failed backup undoes the rollback
     result = await events.update_one(
         {"_id": ObjectId(event_id)},
         {"$set": rollback_data}
@@ -103,39 +113,82 @@ async def rollback_event_version(
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Rollback failed")
 
+    try:
+        await record_change(
+            db,
+            event_id,
+            current_snapshot,
+            rollback_data,
+            current_user["email"],
+            diff,
+            change_type="rollback",
+            reason=f"Rollback to version {version_id}"
+        )
+    except VersionWriteError:
+        raise HTTPException(status_code=503, detail="Could not record the rollback in the event history; it was not applied")
+
+    events_changed(event, rollback_data)
+
     updated_event = await events.find_one({"_id": ObjectId(event_id)})
-    updated_event["_id"] = str(updated_event["_id"])
+    await sync_event_access(db, updated_event)
     # print(updated_event)
 
-    return {
+    return BSONResponse({
         "message": f"Rolled back to version {version_id}",
         "event": updated_event
-    }
+    })
 
 
-@router.get("/events/{event_id}/changelog")
+@router.get("/events/{event_id}/changelog", response_class=BSONResponse)
 async def get_event_changelog(
     event_id: str,
+    request: Request,
+    since: Optional[datetime] = Query(None, description="Only changes recorded after this timestamp"),
+    limit: Optional[int] = Query(None, ge=1),
+    batch_size: int = Query(100, ge=1, le=1000),
     current_user: dict = Depends(get_current_user),
     auth=Depends(PermissionChecker("events", "GET") )
 ):
     db = get_db()
-    versions = await db["event_versions"].find(
-        {"event_id": event_id},{"_id": 0}
-    ).sort("timestamp", 1).to_list(length=None)
+    ndjson = wants_ndjson(request)
+    etag = await _history_etag(db, event_id, "changelog", since, limit, ndjson)
+    if etag_matches(request.headers.get("if-none-match"), etag, weak=True):
+        return not_modified(etag)
+
+    extra_filter = {"timestamp": {"$gt": since}} if since else None
+
+    # compacted (delta) rows carry no data of their own: every entry gets its full snapshot back
+    async def changes():
+        count = 0
+        states = iter_version_states(db, event_id, extra_filter, batch_size=batch_size)
+        try:
+            async for version, snapshot in states:
+                if limit and count >= limit:
+                    break
+                entry = {key: value for key, value in version.items() if key not in ("_id", "delta")}
+                entry["data"] = snapshot
+                count += 1
+                yield entry
+        finally:
+            await states.aclose()
+
+    # Accept: application/x-ndjson streams one change per line as it is resolved
+    if ndjson:
+        response = ndjson_response(changes())
+        response.headers["ETag"] = etag
+        return response
+
+    versions = [entry async for entry in changes()]
     # print(versions)
-    for v in versions:
-        # v["_id"] = str(v["_id"])
-        v["timestamp"] = v["timestamp"].isoformat()
 
-    return {
+    return BSONResponse({
         "event_id": event_id,
         "changelog": versions
-    }
+    }, headers={"ETag": etag})
 
 
 
-@router.get("/events/{event_id}/diff/{version_id_1}/{version_id_2}")
+@router.get("/events/{event_id}/diff/{version_id_1}/{version_id_2}", response_class=BSONResponse)
 async def get_event_diff(
     event_id: str,
     version_id_1: str,
@@ -144,56 +197,75 @@ async def get_event_diff(
 ):
     db = get_db()
 
-    # Fetch both versions
-    v1 = await db["event_versions"].find_one({"_id": ObjectId(version_id_1), "event_id": event_id})
-    v2 = await db["event_versions"].find_one({"_id": ObjectId(version_id_2), "event_id": eve    nt_id})
-
-    if not v1 or not v2:
+    # Versions are immutable, so the diff is computed once and then served from cache
+    cached = await get_version_diff(db, event_id, version_id_1, version_id_2)
+    if not cached:
         raise HTTPException(status_code=404, detail="One or both versions not found")
 
-    d1 = v1.get("data", {})
-    d2 = v2.get("data", {})
-
-    # Perform diff
-    diff = diff_versions(d1, d2)
-
-
-    return {
+    return BSONResponse({
         "event_id": event_id,
-        "version_1": str(v1["_id"]),
-        "version_2": str(v2["_id"]),
-        "diff": diff
-    }
+        "version_1": version_id_1,
+        "version_2": version_id_2,
+        "diff": cached["diff"]
+    })
 
 
-@router.get("/events/{event_id}/versions/data")
+@router.get("/events/{event_id}/versions/data", response_class=BSONResponse)
 async def get_all_event_versions_data(
     event_id: str,
+    request: Request,
+    since: Optional[datetime] = Query(None, description="Only versions recorded after this timestamp"),
+    limit: Optional[int] = Query(None, ge=1),
+    batch_size: int = Query(100, ge=1, le=1000),
     current_user: dict = Depends(get_current_user)
 ):
     db = get_db()
-    versions_cursor = db["event_versions"].find(
-        {"event_id": event_id}
-    ).sort("timestamp", 1)
-
-    versions = []
-    async for version in versions_cursor:
-        version_id = str(version["_id"])
-        snapshot = version.get("data", {})
-        snapshot["version_id"] = version_id
-        snapshot["change_type"] = version.get("change_type", "update")
-        snapshot["timestamp"] = version.get("timestamp").isoformat() if "timestamp" in version else None
-        snapshot["changed_by"] = version.get("changed_by")
+    ndjson = wants_ndjson(request)
+    etag = await _history_etag(db, event_id, "versions_data", since, limit, ndjson)
+    if etag_matches(request.headers.get("if-none-match"), etag, weak=True):
+        return not_modified(etag)
+
+    extra_filter = {"timestamp": {"$gt": since}} if since else None
+
+    async def snapshots():
+        count = 0
+        states = iter_version_states(db, event_id, extra_filter, batch_size=batch_size)
+        try:
+            async for version, snapshot in states:
+                if limit and count >= limit:
+                    break
+                snapshot = dict(snapshot)
+                snapshot["version_id"] = str(version["_id"])
+                snapshot["change_type"] = version.get("change_type", "update")
+                snapshot["timestamp"] = version.get("timestamp")
+                snapshot["changed_by"] = version.get("changed_by")
+                count += 1
+                yield snapshot
+        finally:
+            await states.aclose()
+
+    records = snapshots()
+    first = await anext(records, None)
+    if first is None:
+        raise HTTPException(status_code=404, detail="No versions found")
 
+    if ndjson:
+        async def stream():
+            yield first
+            async for snapshot in records:
+                yield snapshot
+        response = ndjson_response(stream())
+        response.headers["ETag"] = etag
+        return response
+
+    versions = [first]
+    async for snapshot in records:
         versions.append(snapshot)
 
-    if not versions:
-        raise HTTPException(status_code=404, detail="No versions found")
-
-    return {
+    return BSONResponse({
         "event_id": event_id,
         "versions_data": versions
-    }
+    }, headers={"ETag": etag})
 
 
 
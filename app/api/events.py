@@ -1,12 +1,30 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
-from app.schemas.event import EventCreate, EventUpdate
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+import asyncio
+import heapq
+import time
+from app.schemas.event import EventBase, EventCreate, EventUpdate, EventBulkUpdate, EventBulkDelete
 from app.api.auth import get_current_user
+from app.core.config import BULK_IMPORT_CHUNK_SIZE, EVENT_ACCESS_READS, EVENT_LIST_QUERY_MODE
 from app.database import get_db
 from app.utils.diff import diff_versions
+from app.utils.etag import etag_matches, make_etag, not_modified
+from app.utils.responses import BSONResponse
+from app.utils.streaming import iter_ndjson_lines
+from app.utils.logger import logger
+from app.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, seek_filter
+from app.services.access import count_listed, get_access, listed_page, listed_query, remove_event_access, sync_event_access
 from app.services.collab import CollaborationManager
+from app.services.freebusy import find_overlaps, resolve_user
+from app.services.invalidation import events_changed
+from app.services.list_cache import ANY_EVENT, get_cached_list, list_cache_stats, set_cached_list, stamp
+from app.services.recurrence import expand_series, occurrence_starts, resolve_window
+from app.services.versioning import VersionWriteError, find_version_after, find_versions_after, iter_version_states, load_version_data, record_change, record_versions
 from app.core.permissions import ensure_collaborator
 from fastapi import WebSocket, WebSocketDisconnect
 from app.core.permissions import PermissionChecker
@@ -14,138 +32,687 @@ from app.utils.diff import diff_versions
 
 router = APIRouter()
 
+EVENT_LIST_SORT = [("start_time", 1), ("_id", 1)]
+
+# fields= accepts only these; _id is always returned
+EVENT_FIELDS = frozenset(EventBase.model_fields) | {"created_by", "created_at", "updated_at"}
+# view= presets; "full" (or neither parameter) returns whole documents
+EVENT_VIEWS = {
+    "compact": ("title", "start_time", "end_time"),
+    "summary": ("title", "start_time", "end_time", "location", "is_recurring", "reccurrence_pattern", "created_by"),
+    "full": None,
+}
+
+
+def _can_edit(event: dict, current_user: dict) -> bool:
+    # creator, or a collaborator whose entry grants edit
+    if event["created_by"] == current_user["email"]:
+        return True
+    collaborator = next((c for c in event.get("collaborators", []) if c.get("email") == current_user["email"]), None)
+    return bool(collaborator and collaborator.get("permissions", {}).get("edit", False))
+
+
+def _can_view(event: dict, current_user: dict) -> bool:
+    if event["created_by"] == current_user["email"]:
+        return True
+    collaborator = next((c for c in event.get("collaborators", []) if c.get("email") == current_user["email"]), None)
+    return bool(collaborator and collaborator.get("permissions", {}).get("view", False))
+
+
+def _as_utc(moment: datetime) -> datetime:
+    # stored timestamps are naive UTC
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _requested_fields(fields: Optional[str], view: Optional[str]):
+    # None means whole documents
+    if fields:
+        requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in requested if field not in EVENT_FIELDS and field != "_id"]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(sorted(EVENT_FIELDS))}")
+        return requested
+    if view:
+        if view not in EVENT_VIEWS:
+            raise HTTPException(status_code=400, detail=f"Unknown view '{view}'. Use one of: {', '.join(EVENT_VIEWS)}")
+        return EVENT_VIEWS[view]
+    return None
+
+
+def _projection(requested, *needed: str):
+    # fields the handler itself relies on are read too and trimmed again by _trim
+    if requested is None:
+        return None
+    return dict.fromkeys((*requested, *needed), 1)
+
+
+def _trim(event: dict, requested) -> dict:
+    if requested is None:
+        return event
+    return {key: value for key, value in event.items() if key in requested or key in ("_id", "is_occurrence")}
+
+
+def _event_etag(event_id: str, updated_at, *variant) -> str:
+    # variant distinguishes representations of the same revision (fields/view/as_of)
+    return make_etag("event", event_id, updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at, *variant)
+
+
+async def _event_stamp(db, event_id: str):
+    # (exists, updated_at), projected down to what the id_updated_at index holds
+    doc = await db["events"].find_one({"_id": ObjectId(event_id)}, {"_id": 1, "updated_at": 1})
+    return doc is not None, (doc or {}).get("updated_at")
+
+
+# fields _can_view reads; not needed when event_access answers the check
+_VIEW_CHECK_FIELDS = () if EVENT_ACCESS_READS else ("created_by", "collaborators")
+
+
+async def _get_viewable_event(db, event_id: str, current_user: dict, projection: dict = None) -> dict:
+    if not ObjectId.is_valid(event_id):
+        raise HTTPException(status_code=404, detail="Event not found")
+    if EVENT_ACCESS_READS:
+        access = await get_access(db, event_id, current_user["email"])
+        if not (access and access["can_view"]):
+            exists, _ = await _event_stamp(db, event_id)
+            if not exists:
+                raise HTTPException(status_code=404, detail="Event not found")
+            raise HTTPException(status_code=403, detail="You do not have view permission")
+
+    event = await db["events"].find_one({"_id": ObjectId(event_id)}, projection)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    event["_id"] = str(event["_id"])
+    if not EVENT_ACCESS_READS and not _can_view(event, current_user):
+        raise HTTPException(status_code=403, detail="You do not have view permission")
+    return event
+
+
+async def _viewable_stamp(db, event_id: str, current_user: dict):
+    # the same 404/403 as _get_viewable_event, but only updated_at is read back
+    if EVENT_ACCESS_READS:
+        access = await get_access(db, event_id, current_user["email"])
+        exists, updated_at = await _event_stamp(db, event_id)
+        if not exists:
+            raise HTTPException(status_code=404, detail="Event not found")
+        if not (access and access["can_view"]):
+            raise HTTPException(status_code=403, detail="You do not have view permission")
+        return updated_at
+
+    event = await db["events"].find_one({"_id": ObjectId(event_id)}, {"created_by": 1, "collaborators": 1, "updated_at": 1})
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if not _can_view(event, current_user):
+        raise HTTPException(status_code=403, detail="You do not have view permission")
+    return event.get("updated_at")
+
+
+async def _user_can_edit(db, event: dict, current_user: dict) -> bool:
+    if EVENT_ACCESS_READS:
+        access = await get_access(db, event["_id"], current_user["email"])
+        return bool(access and access["can_edit"])
+    return _can_edit(event, current_user)
+
+
+async def _check_conflicts(db, event_data: dict, current_user: dict, exclude_event_id: str = None):
+    # 409 if the event overlaps anything on the calendar of its creator or collaborators
+    participants = [current_user["email"]]
+    for collaborator in event_data.get("collaborators") or []:
+        if collaborator.get("email") and collaborator["email"] not in participants:
+            participants.append(collaborator["email"])
+
+    start, end = _as_utc(event_data["start_time"]), _as_utc(event_data["end_time"])
+    # with their user ids, so events shared with them by id count too
+    users = await asyncio.gather(*(resolve_user(db, email) for email in participants))
+    overlaps = await asyncio.gather(*(
+        find_overlaps(db, email, start, end, user[1] if user else None) for email, user in zip(participants, users)
+    ))
+    conflicts = []
+    for email, found in zip(participants, overlaps):
+        for other_start, other_end, other_id in found:
+            if other_id == exclude_event_id:
+                continue
+            conflict = {"user": email, "start": other_start.isoformat(), "end": other_end.isoformat()}
+            if email == current_user["email"]:
+                conflict["event_id"] = other_id  # other users' events stay private
+            conflicts.append(conflict)
+    if conflicts:
+        raise HTTPException(status_code=409, detail={"message": "Event overlaps existing events", "conflicts": conflicts})
+
+
+async def _facet_page(collection, filters: dict, page_filter: dict, skip: int, limit: int, projection: dict = None, ids_as_strings: bool = True):
+    """One aggregation returning (page rows, total matching filters).
+
+    _id is stringified in the pipeline unless rows still have to be merged with
+    ObjectId-keyed occurrences; datetimes are left to BSONResponse, whose
+    output matches isoformat() where $dateToString would not.
+    """
+    page = [] if page_filter is filters else [{"$match": page_filter}]
+    page += [{"$sort": dict(EVENT_LIST_SORT)}]
+    if skip:
+        page.append({"$skip": skip})
+    page.append({"$limit": limit})
+    if projection:
+        page.append({"$project": projection})
+    if ids_as_strings:
+        page.append({"$set": {"_id": {"$toString": "$_id"}}})
+
+    pipeline = [
+        {"$match": filters},
+        {"$facet": {"events": page, "total": [{"$count": "count"}]}},
+    ]
+    result = await collection.aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {"events": [], "total": []}
+    return facets["events"], facets["total"][0]["count"] if facets["total"] else 0
+
+
+def _sort_key(event: dict):
+    return event["start_time"], event["_id"]
+
+
+async def _events_as_of(db, visibility: dict, as_of: datetime, date_range: dict, projection: dict = None) -> list:
+    """Visible events as they were at `as_of`, sorted, with series expanded over date_range.
+
+    Historical start times can differ from the live ones, so candidates can't be
+    narrowed or paged in the query: every visible event that existed at as_of
+    is read, its state resolved with one aggregation over event_versions, and
+    the filtering, sorting and paging happen here.
+    """
+    query = {**visibility, "$nor": [{"created_at": {"$gt": as_of}}]}
+    live = [event async for event in db["events"].find(query, projection)]
+    versions = await find_versions_after(db, [str(event["_id"]) for event in live], as_of)
+
+    rows = []
+    for event in live:
+        version = versions.get(str(event["_id"]))
+        state = {**await load_version_data(db, version), "_id": event["_id"]} if version else event
+        start = state.get("start_time")
+        if not isinstance(start, datetime):
+            continue
+        if date_range and state.get("is_recurring") and isinstance(state.get("end_time"), datetime):
+            # expanded directly: the occurrence cache holds live rules only
+            window_start, window_end = resolve_window(date_range.get("$gte", start), date_range.get("$lte"))
+            duration = state["end_time"] - start
+            rows.extend(
+                {**state, "start_time": occurrence, "end_time": occurrence + duration, "is_occurrence": True}
+                for occurrence in occurrence_starts(start, state.get("reccurrence_pattern"), window_start, window_end)
+            )
+        elif ("$gte" not in date_range or start >= date_range["$gte"]) and ("$lte" not in date_range or start <= date_range["$lte"]):
+            rows.append(state)
+    rows.sort(key=_sort_key)
+    return rows
+
+
+def _parse_event_ids(event_ids: List[str]):
+    # returns (unique ObjectIds in request order, results for ids that aren't valid ObjectIds)
+    object_ids, results = [], []
+    for event_id in dict.fromkeys(event_ids):
+        if ObjectId.is_valid(event_id):
+            object_ids.append(ObjectId(event_id))
+        else:
+            results.append({"event_id": event_id, "status": "invalid_id"})
+    return object_ids, results
+
 # Create a new event
 @router.post("/events")
-async def create_event(event: EventCreate, current_user: dict = Depends(get_current_user), auth=Depends(PermissionChecker("events", "POST"))):
+async def create_event(
+    event: EventCreate,
+    check_conflicts: bool = Query(False, description="Reject with 409 if the event overlaps the calendar of its creator or collaborators"),
+    current_user: dict = Depends(get_current_user),
+    auth=Depends(PermissionChecker("events", "POST"))
+):
     db = get_db()
     event_data = event.dict()
+    if check_conflicts:
+        await _check_conflicts(db, event_data, current_user)
     event_data.update({
         "created_by": current_user["email"],
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
-        "collaborators": event.collaborators or []
+        "collaborators": event_data.get("collaborators") or []
     })
     result = await db["events"].insert_one(event_data)
+    await sync_event_access(db, event_data)
+    events_changed(event_data)
     return {"message": "Event created", "event_id": str(result.inserted_id)}
 
 
 
 #get events with date filtering and pagination per page
-@router.get("/events")
+# Two pagination modes:
+#   - page/per_page (skip based, kept for old clients)
+#   - cursor: pass cursor= (empty for the first page) and follow next_cursor;
+#     seeks on (start_time, _id) so deep pages cost the same as the first one
+# With a date range, recurring series are expanded into their occurrences in
+# that range and merged with one-off events in (start_time, _id) order.
+# as_of lists every visible event as it was at that time (the list form of
+# GET /events/{id}?as_of=), see _events_as_of.
+# Rendered responses are cached per user and query (app/services/list_cache.py).
+@router.get("/events", response_class=BSONResponse)
 async def get_events(
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=100),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
     user_id: Optional[str] = Query(None, description="Filter by a specific user ID"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor; empty string starts from the first page"),
+    include_total: Optional[bool] = Query(None, description="Count matching events (default: true in page mode, false in cursor mode)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. title,start_time,end_time"),
+    view: Optional[str] = Query(None, description="Preset field set: compact, summary or full"),
+    as_of: Optional[datetime] = Query(None, description="List events as they were at this time (ISO 8601); page mode only"),
     current_user: dict = Depends(get_current_user)
 ):
     db = get_db()
     events_collection = db["events"]
+    requested = _requested_fields(fields, view)
+    cursor_mode = cursor is not None
+    if include_total is None:
+        include_total = not cursor_mode
+
+    if as_of is not None:
+        if cursor_mode:
+            raise HTTPException(status_code=400, detail="as_of lists are paged with page/per_page, not cursor")
+        as_of = _as_utc(as_of)
+
+    cache_key = (current_user["email"], page, per_page, start_date, end_date, user_id, cursor, include_total, requested, as_of)
+    cached = get_cached_list(cache_key)
+    if cached is not None:
+        return Response(cached, media_type="application/json")
+    # with user_id every event can match, so any write invalidates the entry
+    stamps = stamp([ANY_EVENT] if user_id else [current_user["email"]])
+
+    # start_time is the sort key; series also need their rule to be expanded
+    projection = _projection(requested, "start_time")
     # print(current_user)
     # If no user_id passed, default to current user
-    target_user_id = user_id
+    target_user_id = user_id or current_user["email"]
     target_user_email = current_user["email"]  # creator email only from logged-in user
 
-    # Base access filter: creator or collaborator
-    filters = {
+    # Date range filter
+    date_range = {}
+    try:
+        # offsets are accepted and converted; stored times (and series expansion) are naive UTC
+        if start_date:
+            date_range["$gte"] = _as_utc(datetime.fromisoformat(start_date))
+        if end_date:
+            date_range["$lte"] = _as_utc(datetime.fromisoformat(end_date))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+    # Base access filter: creator or collaborator. In access mode the page is
+    # walked on event_access (user_listed_start_time) and only its ids are fetched.
+    access_mode = EVENT_ACCESS_READS and not user_id
+    visibility = {
         "$or": [
             {"created_by": target_user_email if not user_id else {"$exists": True}},  # allow creator check only for self
             {"collaborators.user_id": target_user_id}
         ]
     }
-
-    # Date range filter
-    if start_date or end_date:
-        date_range = {}
+    filters = dict(visibility)
+    access_filters = listed_query(target_user_email)
+
+    if as_of is not None:
+        if access_mode:
+            visibility = {"_id": {"$in": await listed_page(db, access_filters)}}
+        rows = await _events_as_of(db, visibility, as_of, date_range, _projection(requested, "start_time", "end_time", "is_recurring", "reccurrence_pattern"))
+        skip = (page - 1) * per_page
+        total_count = len(rows)
+        response = BSONResponse({
+            "page": page,
+            "per_page": per_page,
+            "as_of": as_of,
+            "total_events": total_count,
+            "total_pages": (total_count + per_page - 1) // per_page,
+            "events": [_trim(event, requested) for event in rows[skip:skip + per_page]]
+        })
+        set_cached_list(cache_key, response.body, stamps)
+        return response
+
+    occurrences = []
+    if date_range:
+        # series are stored once and matched by the window, not by their first start_time
+        series_start = {"$lte": date_range["$lte"]} if "$lte" in date_range else None
+        if access_mode:
+            series_ids = await listed_page(db, listed_query(target_user_email, series_start, is_recurring=True))
+            series_filters = {"_id": {"$in": series_ids}}
+        else:
+            series_filters = {**visibility, "is_recurring": True}
+            if series_start:
+                series_filters["start_time"] = series_start
+        has_series = False
+        series_projection = _projection(requested, "start_time", "end_time", "reccurrence_pattern")
+        async for series in events_collection.find(series_filters, series_projection):
+            has_series = True
+            window_start, window_end = resolve_window(date_range.get("$gte", series["start_time"]), date_range.get("$lte"))
+            occurrences.extend(expand_series(series, window_start, window_end))
+        if has_series:
+            filters["is_recurring"] = {"$ne": True}
+            access_filters["is_recurring"] = False
+        occurrences.sort(key=_sort_key)
+        filters["start_time"] = date_range
+        access_filters["start_time"] = date_range
+    occurrence_total = len(occurrences)
+
+    access_query = access_filters
+    if cursor_mode:
+        query = filters
+        if cursor:
+            try:
+                after_start, after_id = decode_cursor(cursor)
+            except InvalidCursor:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = {"$and": [filters, seek_filter(after_start, after_id)]}
+            access_query = {"$and": [access_filters, seek_filter(after_start, after_id, id_field="event_id")]}
+            occurrences = [o for o in occurrences if _sort_key(o) > (after_start, after_id)]
+        # one extra row tells us whether there is a next page
+        skip, limit = 0, per_page + 1
+        db_skip, db_limit = 0, limit
+    elif occurrences:
+        # the page can only be cut after merging, so stored events are read from the start
+        query = filters
+        skip, limit = (page - 1) * per_page, per_page
+        db_skip, db_limit = 0, skip + limit
+    else:
+        # Pagination 
+        query = filters
+        skip, limit = (page - 1) * per_page, per_page
+        db_skip, db_limit = skip, limit
+
+    # page and count in one round trip; the two-query path is the fallback
+    rows = None
+    if access_mode:
+        page_ids = await listed_page(db, access_query, db_skip, db_limit)
+        by_id = {event["_id"]: event async for event in events_collection.find({"_id": {"$in": page_ids}}, projection)}
+        rows = [by_id[event_id] for event_id in page_ids if event_id in by_id]
+        stored_total = await count_listed(db, access_filters) if include_total else None
+    elif include_total and EVENT_LIST_QUERY_MODE == "facet":
         try:
-            if start_date:
-                date_range["$gte"] = datetime.fromisoformat(start_date)
-            if end_date:
-                date_range["$lte"] = datetime.fromisoformat(end_date)
-            filters["start_time"] = date_range
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
-
-    # Pagination 
-    skip = (page - 1) * per_page
+            rows, stored_total = await _facet_page(
+                events_collection, filters, query, db_skip, db_limit, projection, ids_as_strings=not occurrences
+            )
+        except OperationFailure as exc:
+            logger.warning(f"$facet event list failed, falling back to find + count: {exc}")
+    if rows is None:
+        db_cursor = events_collection.find(query, projection).sort(EVENT_LIST_SORT).skip(db_skip).limit(db_limit)
+        rows = [event async for event in db_cursor]
+        stored_total = await events_collection.count_documents(filters) if include_total else None
+
+    if occurrences:
+        rows = list(heapq.merge(rows, occurrences, key=_sort_key))[skip:skip + limit]
 
     # Query events
-    cursor = events_collection.find(filters).sort("start_time", 1).skip(skip).limit(per_page)
     events = []
-    async for event in cursor:
-        event["_id"] = str(event["_id"])
-        for field in ["start_time", "end_time", "created_at", "updated_at"]:
-            if field in event and isinstance(event[field], datetime):
-                event[field] = event[field].isoformat()
-        events.append(event)
+    next_cursor = None
+    for event in rows:
+        if cursor_mode and len(events) == per_page:
+            next_cursor = encode_cursor(*last_key)
+            break
+        last_key = (event["start_time"], event["_id"])
+        events.append(_trim(event, requested))
 
     # Total count
-    total_count = await events_collection.count_documents(filters)
-    total_pages = (total_count + per_page - 1) // per_page
-
-    data = {
-        "page": page,
-        "per_page": per_page,
-        "total_events": total_count,
-        "total_pages": total_pages,
-        "events": events
-    }
-    return data
+    total_count = stored_total + occurrence_total if include_total else None
+
+    if cursor_mode:
+        data = {
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "events": events
+        }
+        if include_total:
+            data["total_events"] = total_count
+    else:
+        data = {
+            "page": page,
+            "per_page": per_page,
+            "total_events": total_count,
+            "total_pages": (total_count + per_page - 1) // per_page if include_total else None,
+            "events": events
+        }
 
+    response = BSONResponse(data)
+    set_cached_list(cache_key, response.body, stamps)
+    return response
 
 
-# Get a specific event by ID
-@router.get("/events/{event_id}")
-async def get_event(event_id: str, current_user: dict = Depends(get_current_user), auth=Depends(PermissionChecker("events", "GET"))):
+# hit/miss counters of the event list response cache (per worker)
+@router.get("/events/list-cache/stats")
+async def get_list_cache_stats(current_user: dict = Depends(get_current_user), auth=Depends(PermissionChecker("events", "GET"))):
+    return list_cache_stats()
+
+
+
+# Bulk update: one $in read for the events, one bulk write of versions and one
+# bulk_write for the changes, however many events; edit rights are checked like
+# PUT /events/{event_id}, concurrently
+@router.patch("/events/bulk")
+async def bulk_update_events(payload: EventBulkUpdate, current_user: dict = Depends(get_current_user), auth=Depends(PermissionChecker("events", "PUT"))):
     db = get_db()
-    # print(event_id)
-    event = await db["events"].find_one({"_id": ObjectId(event_id)})
-    event["_id"] = str(event["_id"])
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
+    # null means "not given": none of the patchable fields can be cleared in bulk
+    changes = {field: value for field, value in payload.changes.dict(exclude_unset=True).items() if value is not None}
+    if not changes and not payload.shift_minutes:
+        raise HTTPException(status_code=400, detail="Nothing to update: pass changes and/or shift_minutes")
 
-    if event["created_by"] == current_user["email"]:
-        # event["_id"] = str(event["_id"])
-        return event
+    object_ids, results = _parse_event_ids(payload.event_ids)
+    events = {event["_id"]: event async for event in db["events"].find({"_id": {"$in": object_ids}})}
+    editable = dict(zip(events, await asyncio.gather(*(_user_can_edit(db, event, current_user) for event in events.values()))))
 
-    collaborator = next((c for c in event.get("collaborators", []) if c["email"] == current_user["email"]), None)
-    if not (collaborator and collaborator.get("permissions", {}).get("view", False)):
-        raise HTTPException(status_code=403, detail="You do not have view permission")
+    now = datetime.utcnow()
+    shift = timedelta(minutes=payload.shift_minutes) if payload.shift_minutes else None
+    version_entries, writes, updated_ids, new_values_by_id = [], [], [], {}
+    for object_id in object_ids:
+        event = events.get(object_id)
+        if not event:
+            results.append({"event_id": str(object_id), "status": "not_found"})
+            continue
+        if not editable[object_id]:
+            results.append({"event_id": str(object_id), "status": "forbidden"})
+            continue
+
+        new_values = dict(changes)
+        if shift:
+            for field in ("start_time", "end_time"):
+                if isinstance(event.get(field), datetime):
+                    new_values[field] = new_values.get(field, event[field]) + shift
+        start, end = new_values.get("start_time", event.get("start_time")), new_values.get("end_time", event.get("end_time"))
+        if isinstance(start, datetime) and isinstance(end, datetime) and _as_utc(start) >= _as_utc(end):
+            results.append({"event_id": str(object_id), "status": "invalid", "error": "start_time must be before end_time"})
+            continue
+        new_values["updated_at"] = now
+
+        snapshot = dict(event, _id=str(object_id))
+        version_entries.append((str(object_id), snapshot, diff_versions(snapshot, {**snapshot, **new_values})))
+        writes.append(UpdateOne({"_id": object_id}, {"$set": new_values}))
+        updated_ids.append(str(object_id))
+        new_values_by_id[str(object_id)] = new_values
+
+    if writes:
+        await record_versions(db, version_entries, current_user["email"], change_type="bulk_update")
+        await db["events"].bulk_write(writes, ordered=False)
+        updated = [{**events[ObjectId(event_id)], **new_values_by_id[event_id]} for event_id in updated_ids]
+        await sync_event_access(db, *updated)
+        events_changed(*updated)
+    results.extend({"event_id": event_id, "status": "updated"} for event_id in updated_ids)
+
+    return {"message": f"{len(updated_ids)} events updated", "results": results}
+
+
+# Bulk delete: only events created by the current user are removed
+@router.delete("/events/bulk")
+async def bulk_delete_events(payload: EventBulkDelete, current_user: dict = Depends(get_current_user), auth=Depends(PermissionChecker("events", "DELETE"))):
+    db = get_db()
+    object_ids, results = _parse_event_ids(payload.event_ids)
+    found = {
+        event["_id"]: event
+        async for event in db["events"].find({"_id": {"$in": object_ids}}, {"created_by": 1, "collaborators": 1})
+    }
 
-    return event
+    deletable = []
+    for object_id in object_ids:
+        if object_id not in found:
+            results.append({"event_id": str(object_id), "status": "not_found"})
+        elif found[object_id]["created_by"] != current_user["email"]:
+            results.append({"event_id": str(object_id), "status": "forbidden"})
+        else:
+            deletable.append(object_id)
+
+    deleted = 0
+    if deletable:
+        result = await db["events"].delete_many({"_id": {"$in": deletable}, "created_by": current_user["email"]})
+        deleted = result.deleted_count
+        await remove_event_access(db, *deletable)
+        events_changed(*(found[object_id] for object_id in deletable))
+    results.extend({"event_id": str(object_id), "status": "deleted"} for object_id in deletable)
+
+    return {"message": f"{deleted} events deleted", "results": results}
+
+
+
+# Get a specific event by ID
+# as_of returns the event as it was at that moment: every version stores the
+# state *before* a change, so that is the first version recorded after as_of
+# (one seek on event_id_timestamp), or the live event if nothing changed since.
+# ETag follows updated_at; If-None-Match is answered after a view check that
+# reads only created_by/collaborators/updated_at (or event_access).
+@router.get("/events/{event_id}", response_class=BSONResponse)
+async def get_event(
+    event_id: str,
+    request: Request,
+    as_of: Optional[datetime] = Query(None, description="Return the event as it was at this time (ISO 8601)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. title,start_time,end_time"),
+    view: Optional[str] = Query(None, description="Preset field set: compact, summary or full"),
+    current_user: dict = Depends(get_current_user),
+    auth=Depends(PermissionChecker("events", "GET"))
+):
+    db = get_db()
+    requested = _requested_fields(fields, view)
+    variant = (requested, as_of.isoformat() if as_of else None)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and ObjectId.is_valid(event_id):
+        # view check first: a 304 must not be a way around the 403
+        updated_at = await _viewable_stamp(db, event_id, current_user)
+        etag = _event_etag(event_id, updated_at, *variant)
+        if etag_matches(if_none_match, etag, weak=True):
+            return not_modified(etag)
+
+    event = await _get_viewable_event(db, event_id, current_user, _projection(requested, "created_at", "updated_at", *_VIEW_CHECK_FIELDS))
+    headers = {"ETag": _event_etag(event_id, event.get("updated_at"), *variant)}
+    if as_of is None:
+        return BSONResponse(_trim(event, requested), headers=headers)
+
+    as_of = _as_utc(as_of)
+    if event.get("created_at") and event["created_at"] > as_of:
+        raise HTTPException(status_code=404, detail="Event did not exist at that time")
+
+    version = await find_version_after(db, event["_id"], as_of)
+    if not version:
+        return BSONResponse(_trim(event, requested), headers=headers)
+    state = await load_version_data(db, version)
+    return BSONResponse(_trim({**state, "_id": event["_id"]}, requested), headers=headers)
+
+
+# Range form of as_of: every state the event was in between start and end,
+# each with the interval it was valid for (valid_to is None for the live state)
+@router.get("/events/{event_id}/states", response_class=BSONResponse)
+async def get_event_states(
+    event_id: str,
+    start: datetime = Query(..., description="Range start (ISO 8601)"),
+    end: Optional[datetime] = Query(None, description="Range end (ISO 8601), defaults to now"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user),
+    auth=Depends(PermissionChecker("events", "GET"))
+):
+    db = get_db()
+    event = await _get_viewable_event(db, event_id, current_user)
+    start = _as_utc(start)
+    end = _as_utc(end) if end else datetime.utcnow()
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+    created_at = event.get("created_at")
+    if created_at and created_at > end:
+        return BSONResponse({"event_id": event["_id"], "states": [], "truncated": False})
+
+    states = []
+    valid_from = max(start, created_at) if created_at else start
+    truncated = False
+    # the first version after start holds the state at start; stop after the
+    # first one past end, which holds the state at end
+    versions = iter_version_states(db, event["_id"], extra_filter={"timestamp": {"$gt": start}}, projection={"diff": 0})
+    async for version, state in versions:
+        if len(states) == limit:
+            truncated = True
+            break
+        states.append({"valid_from": valid_from, "valid_to": version["timestamp"], "version_id": str(version["_id"]), "data": {**state, "_id": event["_id"]}})
+        valid_from = version["timestamp"]
+        if valid_from > end:
+            break
+    else:
+        if len(states) < limit:
+            states.append({"valid_from": valid_from, "valid_to": None, "version_id": None, "data": event})
+        else:
+            truncated = True
+    await versions.aclose()
+
+    return BSONResponse({"event_id": event["_id"], "states": states, "truncated": truncated})
 
 
 
 # Update an event (with version logging)
+# If-Match (the ETag of GET /events/{id}) makes the write conditional: 412 if
+# the event changed since the client read it.
 @router.put("/events/{event_id}")
-async def update_event(event_id: str, update: EventUpdate, current_user: dict = Depends(get_current_user), auth=Depends(PermissionChecker("events", "PUT"))):
+async def update_event(
+    event_id: str,
+    update: EventUpdate,
+    request: Request,
+    response: Response,
+    check_conflicts: bool = Query(False, description="Reject with 409 if the new times overlap the calendar of the editor or collaborators"),
+    current_user: dict = Depends(get_current_user),
+    auth=Depends(PermissionChecker("events", "PUT"))
+):
     db = get_db()
-    event = await db["events"].find_one({"_id": ObjectId(event_id)})
-    event["_id"] = str(event["_id"])
+    event = await db["events"].find_one({"_id": ObjectId(event_id)}) if ObjectId.is_valid(event_id) else None
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
+    event["_id"] = str(event["_id"])
 
-    if event["created_by"] == current_user["email"]:
-        has_permission = True
-    else:
-        collaborator = next((c for c in event.get("collaborators", []) if c["email"] == current_user["email"]), None)
-        has_permission = collaborator and collaborator.get("permissions", {}).get("edit", False)
-
-    if not has_permission:
+    if not await _user_can_edit(db, event, current_user):
         raise HTTPException(status_code=403, detail="You do not have edit access")
 
-    # Save version
+    if_match = request.headers.get("if-match")
+    if if_match and not etag_matches(if_match, _event_etag(event_id, event.get("updated_at"), None, None)):
+        raise HTTPException(status_code=412, detail="Event was modified since it was fetched")
+
+    if check_conflicts:
+        await _check_conflicts(db, update.dict(), current_user, exclude_event_id=event_id)
+
+    now = datetime.utcnow()
+    # BSON dates keep milliseconds; the ETag sent back must match what is stored
+    new_values = {**update.dict(), "updated_at": now.replace(microsecond=now.microsecond // 1000 * 1000)}
+    write_filter = {"_id": ObjectId(event_id)}
+    if if_match:
+        # closes the window between the check above and the write
+        write_filter["updated_at"] = event.get("updated_at")
+    result = await db["events"].update_one(write_filter, {"$set": new_values})
+    if result.matched_count == 0:
+        if if_match:
+            raise HTTPException(status_code=412, detail="Event was modified since it was fetched")
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    # Save version; a PUT that changes nothing adds no history
     diff = diff_versions(event, update.dict())
-    await db["event_versions"].insert_one({
-        "event_id": event_id,
-        "data": event,
-        "diff": diff,
-        "changed_by": current_user["email"],
-        "timestamp": datetime.utcnow()
-    })
+    if diff:
+        try:
+            await record_change(db, event_id, event, new_values, current_user["email"], diff)
+        except VersionWriteError:
+            raise HTTPException(status_code=503, detail="Could not record the change in the event history; the update was not applied")
 
-    await db["events"].update_one({"_id": ObjectId(event_id)}, {"$set": update.dict()})
+    await sync_event_access(db, {**event, **new_values})
+    events_changed(event, new_values)
+    response.headers["ETag"] = _event_etag(event_id, new_values["updated_at"], None, None)
     return {"message": "Event updated"}
 
 
@@ -162,6 +729,8 @@ async def delete_event(event_id: str, current_user: dict = Depends(get_current_u
         raise HTTPException(status_code=403, detail="Only the creator can delete the event")
 
     await db["events"].delete_one({"_id": ObjectId(event_id)})
+    await remove_event_access(db, event_id)
+    events_changed(event)
     return {"message": "Event deleted successfully"}
 
 
@@ -178,13 +747,86 @@ async def create_batch_events(events: List[EventCreate], current_user: dict = De
             "created_by": current_user["email"],
             "created_at": now,
             "updated_at": now,
-            "collaborators": e.collaborators or []
+            "collaborators": doc.get("collaborators") or []
         })
         docs.append(doc)
 
     result = await db["events"].insert_many(docs)
+    await sync_event_access(db, *docs)
+    events_changed(*docs)
     return {"message": f"{len(result.inserted_ids)} events created"}
 
 
+def _describe_validation_error(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc']) or 'body'}: {err['msg']}" for err in exc.errors())
 
 
+# Bulk import: NDJSON body (one EventCreate per line), inserted in unordered chunks
+# so one bad document doesn't abort the rest. The body is never held in memory whole.
+@router.post("/events/import")
+async def import_events(
+    request: Request,
+    chunk_size: int = Query(BULK_IMPORT_CHUNK_SIZE, ge=1, le=10000),
+    errors_only: bool = Query(False, description="Only report failed lines"),
+    current_user: dict = Depends(get_current_user),
+    auth=Depends(PermissionChecker("events", "POST"))
+):
+    db = get_db()
+    started = time.perf_counter()
+    results = []
+    created = 0
+    received = 0
+    chunk = []  # (line_number, doc)
+
+    async def flush():
+        nonlocal created
+        failed = {}
+        try:
+            await db["events"].insert_many([doc for _, doc in chunk], ordered=False)
+        except BulkWriteError as exc:
+            failed = {err["index"]: err.get("errmsg", "write error") for err in exc.details.get("writeErrors", [])}
+        inserted = [doc for index, (_, doc) in enumerate(chunk) if index not in failed]
+        await sync_event_access(db, *inserted)
+        events_changed(*inserted)
+        for index, (line_number, doc) in enumerate(chunk):
+            if index in failed:
+                results.append({"line": line_number, "status": "error", "error": failed[index]})
+            else:
+                created += 1
+                if not errors_only:
+                    results.append({"line": line_number, "status": "created", "event_id": str(doc["_id"])})
+        chunk.clear()
+
+    async for line_number, line in iter_ndjson_lines(request):
+        received += 1
+        try:
+            event = EventCreate.model_validate_json(line)
+        except ValidationError as exc:
+            results.append({"line": line_number, "status": "error", "error": _describe_validation_error(exc)})
+            continue
+
+        now = datetime.utcnow()
+        doc = event.dict()
+        doc.update({
+            "created_by": current_user["email"],
+            "created_at": now,
+            "updated_at": now,
+            "collaborators": doc.get("collaborators") or []
+        })
+        chunk.append((line_number, doc))
+        if len(chunk) >= chunk_size:
+            await flush()
+
+    if chunk:
+        await flush()
+
+    elapsed = time.perf_counter() - started
+    results.sort(key=lambda item: item["line"])
+    return {
+        "received": received,
+        "created": created,
+        "failed": received - created,
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_second": round(created / elapsed, 1) if elapsed > 0 else None,
+        "results": results
+    }
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
+from pymongo.errors import DuplicateKeyError
 from app.schemas.role import RoleCreate, PermissionUpdate
 from app.database import get_db
 from app.api.auth import get_current_user
 from app.core.permissions import PermissionChecker
+from app.crud.roles import invalidate_role_permissions, permission_cache
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -12,15 +14,22 @@ async def create_role(role: RoleCreate, current_user: dict = Depends(get_current
     db = get_db()
     roles_col = db["roles"]
     logger.info(f"Creating role: {role.role} by {current_user['email']}")
-    existing = await roles_col.find_one({"role": role.role})
+    # stored title-cased, so "editor" collides with an existing "Editor"
+    existing = await roles_col.find_one({"role": {"$in": [role.role, role.role.title()]}})
     if existing:
         logger.warning(f"Role {role.role} already exists")  
         raise HTTPException(status_code=400, detail="Role already exists")
     
-    await roles_col.insert_one({
-        "role": role.role.title(),
-        "created_by": current_user["email"]
-    })
+    try:
+        await roles_col.insert_one({
+            "role": role.role.title(),
+            "created_by": current_user["email"]
+        })
+    except DuplicateKeyError:
+        # created concurrently; caught by the unique role index
+        logger.warning(f"Role {role.role} already exists")
+        raise HTTPException(status_code=400, detail="Role already exists")
+    invalidate_role_permissions(role.role.title())
     logger.info(f"Role {role.role} created successfully")
     return {"message": f"Role '{role.role}' created successfully"}
 
@@ -41,6 +50,7 @@ async def assign_permissions(role: str, perms: PermissionUpdate, current_user: d
         {"$set": {"permissions": perms.permissions}},
         upsert=True
     )
+    invalidate_role_permissions(role.title())
     logger.info(f"Permissions for role {role} updated successfully")
 
     return {"message": f"Permissions updated for role '{role}'"}
@@ -67,4 +77,10 @@ async def get_role_permissions(role: str, current_user: dict = Depends(get_curre
         raise HTTPException(status_code=404, detail="Role not found")
     logger.info(f"Permissions for role {role} retrieved successfully")
 
-    return role_permissions
\ No newline at end of file
+    return role_permissions
+
+
+@router.get("/permission-cache/stats")
+async def get_permission_cache_stats(current_user: dict = Depends(get_current_user), auth=Depends(PermissionChecker("roles", "GET"))):
+    # hit/miss counters of the in-process role -> permissions cache (per worker)
+    return permission_cache.stats()
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.api.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime, timezone
+from app.api.auth import get_current_user, token_epoch_cache
 from app.database import get_db
 from bson import ObjectId
 from app.core.permissions import PermissionChecker
+from app.schemas.event import FreeBusyRequest
+from app.services.freebusy import get_busy, resolve_user
+from app.utils.logger import logger
 
 router = APIRouter()
 
@@ -46,10 +50,61 @@ async def assign_role(user_email: str, role_id: str, current_user: dict = Depend
 
     result = await users_col.update_one(
         {"email": user_email},
-        {"$set": {"role_id": role_id}}
+        {"$set": {"role_id": role_id}, "$inc": {"token_epoch": 1}}
     )
+    # invalidates the user's stateless access tokens (other workers within AUTH_EPOCH_CACHE_TTL_SECONDS)
+    token_epoch_cache.pop(user_email)
 
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     logger.info(f"Role '{role_id}' assigned to user '{user_email}' successfully")
     return {"message": f"Role '{role_id}' assigned to user '{user_email}'"}
+
+
+def _freebusy_range(start: datetime, end: datetime):
+    # stored times are naive UTC
+    start, end = (t.astimezone(timezone.utc).replace(tzinfo=None) if t.tzinfo else t for t in (start, end))
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return start, end
+
+
+# Busy blocks only (no event details), so any user with event read access can
+# check someone else's availability
+@router.post("/freebusy")
+async def batch_freebusy(payload: FreeBusyRequest, current_user: dict = Depends(get_current_user), auth=Depends(PermissionChecker("events", "GET"))):
+    db = get_db()
+    start, end = _freebusy_range(payload.start, payload.end)
+    users, unknown = [], []
+    for identifier in dict.fromkeys(payload.users):
+        user = await resolve_user(db, identifier)
+        if user:
+            users.append(user)
+        else:
+            unknown.append(identifier)
+
+    busy = await get_busy(db, users, start, end)
+    return {
+        "start": start,
+        "end": end,
+        "users": {email: {"busy": blocks, "free": not blocks} for email, blocks in busy.items()},
+        "unknown_users": unknown
+    }
+
+
+@router.get("/{user_id}/freebusy")
+async def get_freebusy(
+    user_id: str,
+    start: datetime = Query(..., description="Range start (ISO 8601)"),
+    end: datetime = Query(..., description="Range end (ISO 8601)"),
+    current_user: dict = Depends(get_current_user),
+    auth=Depends(PermissionChecker("events", "GET"))
+):
+    db = get_db()
+    start, end = _freebusy_range(start, end)
+    user = await resolve_user(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    blocks = (await get_busy(db, [user], start, end))[user[0]]
+    return {"user": user[0], "start": start, "end": end, "busy": blocks, "free": not blocks}
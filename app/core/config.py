@@ -0,0 +1,111 @@
+import json
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Role -> permissions cache used by PermissionChecker
+PERMISSION_CACHE_TTL_SECONDS = _env_int("PERMISSION_CACHE_TTL_SECONDS", 60)
+PERMISSION_CACHE_MAX_SIZE = _env_int("PERMISSION_CACHE_MAX_SIZE", 256)
+
+# Create missing indexes (and log drift) when the app starts
+ENSURE_INDEXES_ON_STARTUP = _env_bool("ENSURE_INDEXES_ON_STARTUP", True)
+
+# Event version storage: "full" keeps a complete snapshot in every version,
+# "delta" keeps a full snapshot every VERSION_SNAPSHOT_INTERVAL versions and
+# reverse deltas in between (see app/services/versioning.py)
+VERSION_STORAGE_MODE = os.getenv("VERSION_STORAGE_MODE", "full").lower()
+VERSION_SNAPSHOT_INTERVAL = max(1, _env_int("VERSION_SNAPSHOT_INTERVAL", 10))
+
+# NDJSON event import (POST /api/events/import): documents per insert_many call
+BULK_IMPORT_CHUNK_SIZE = _env_int("BULK_IMPORT_CHUNK_SIZE", 1000)
+
+# Password hashing: bcrypt cost factor and number of threads that run bcrypt
+# off the event loop (this is also the max number of concurrent hashes)
+BCRYPT_ROUNDS = _env_int("BCRYPT_ROUNDS", 12)
+PASSWORD_HASH_WORKERS = max(1, _env_int("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Stateless auth: access tokens carry role/active/permissions so protected
+# routes authorize without reading users/permissions. A user's tokens are
+# rejected once their token_epoch changes (assign_role bumps it); each worker
+# re-reads epochs at most every AUTH_EPOCH_CACHE_TTL_SECONDS.
+AUTH_STATELESS = _env_bool("AUTH_STATELESS", False)
+AUTH_EPOCH_CACHE_TTL_SECONDS = _env_int("AUTH_EPOCH_CACHE_TTL_SECONDS", 30)
+AUTH_EPOCH_CACHE_MAX_SIZE = _env_int("AUTH_EPOCH_CACHE_MAX_SIZE", 10000)
+
+# Collaboration websockets: each connection gets a bounded send queue drained
+# by its own task. When a queue is full the policy decides what happens:
+# "coalesce" drops the oldest pending message, "drop" disconnects the client.
+COLLAB_SEND_QUEUE_SIZE = max(1, _env_int("COLLAB_SEND_QUEUE_SIZE", 100))
+COLLAB_SLOW_CONSUMER_POLICY = os.getenv("COLLAB_SLOW_CONSUMER_POLICY", "coalesce").lower()
+COLLAB_SEND_TIMEOUT_SECONDS = _env_int("COLLAB_SEND_TIMEOUT_SECONDS", 10)
+
+# Collaboration message bus between workers/pods: "memory" (single process)
+# or "mongo" (capped collection tailed by every process)
+COLLAB_BROKER = os.getenv("COLLAB_BROKER", "memory").lower()
+COLLAB_BROKER_COLLECTION = os.getenv("COLLAB_BROKER_COLLECTION", "collab_messages")
+COLLAB_BROKER_CAPPED_BYTES = _env_int("COLLAB_BROKER_CAPPED_BYTES", 16 * 1024 * 1024)
+
+# Version diffs: false uses the event-aware diff in app/utils/diff.py, true keeps
+# the previous DeepDiff-shaped output for clients that still parse it
+DIFF_DEEPDIFF_COMPAT = _env_bool("DIFF_DEEPDIFF_COMPAT", False)
+
+# Version-to-version diffs are immutable: kept in an in-process LRU of this
+# size, backed by the event_version_diffs collection
+VERSION_DIFF_CACHE_SIZE = _env_int("VERSION_DIFF_CACHE_SIZE", 1024)
+
+# Recurring events: occurrences are expanded per requested window and cached
+# per series. Open-ended ranges expand at most RECURRENCE_MAX_WINDOW_DAYS.
+RECURRENCE_CACHE_TTL_SECONDS = _env_int("RECURRENCE_CACHE_TTL_SECONDS", 300)
+RECURRENCE_CACHE_MAX_SIZE = _env_int("RECURRENCE_CACHE_MAX_SIZE", 10000)
+RECURRENCE_MAX_WINDOW_DAYS = max(1, _env_int("RECURRENCE_MAX_WINDOW_DAYS", 366))
+
+# Free/busy: each user's calendar is cached as an interval index; writes to
+# their events drop it, other workers rebuild within the TTL
+FREEBUSY_CACHE_TTL_SECONDS = _env_int("FREEBUSY_CACHE_TTL_SECONDS", 60)
+FREEBUSY_CACHE_MAX_SIZE = _env_int("FREEBUSY_CACHE_MAX_SIZE", 1000)
+
+# GET /api/events responses cached per user and query; event writes drop the
+# lists of the users involved in this worker, other workers within the TTL
+EVENT_LIST_CACHE_ENABLED = _env_bool("EVENT_LIST_CACHE_ENABLED", True)
+EVENT_LIST_CACHE_TTL_SECONDS = _env_int("EVENT_LIST_CACHE_TTL_SECONDS", 30)
+EVENT_LIST_CACHE_MAX_SIZE = _env_int("EVENT_LIST_CACHE_MAX_SIZE", 5000)
+
+# How GET /api/events fetches a page plus its total: "facet" (one aggregation)
+# or "find" (find + count_documents, also the fallback if the aggregation fails)
+EVENT_LIST_QUERY_MODE = os.getenv("EVENT_LIST_QUERY_MODE", "facet").lower()
+
+# Read event visibility/permissions from the event_access collection (covered
+# index lookups) instead of the events' created_by/collaborators. Writes keep
+# event_access in sync either way; run `python -m app.services.access rebuild`
+# once before turning this on for existing data.
+EVENT_ACCESS_READS = _env_bool("EVENT_ACCESS_READS", False)
+
+# Admission control (app/core/ratelimit.py): token buckets and concurrency caps
+# on expensive routes, rejected with 429 + Retry-After. RATE_LIMIT_RULES is a
+# JSON list replacing the built-in rules; "mongo" shares state across workers.
+RATE_LIMIT_ENABLED = _env_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_RULES = json.loads(os.getenv("RATE_LIMIT_RULES") or "null")
+RATE_LIMIT_TRUST_FORWARDED = _env_bool("RATE_LIMIT_TRUST_FORWARDED", False)
+RATE_LIMIT_MAX_KEYS = _env_int("RATE_LIMIT_MAX_KEYS", 100000)
+RATE_LIMIT_LEASE_SECONDS = max(1, _env_int("RATE_LIMIT_LEASE_SECONDS", 60))
+
+# Prometheus metrics at /metrics: per-route request counts/latency, in-flight
+# requests, collaboration and cache state, and (METRICS_MONGO_COMMANDS) Mongo
+# command latency per collection from a driver command listener
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+METRICS_MONGO_COMMANDS = _env_bool("METRICS_MONGO_COMMANDS", True)
@@ -0,0 +1,115 @@
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.utils.logger import logger
+
+# Every index the API relies on, per collection. Names are explicit so drift
+# (same name, different definition) can be detected on startup.
+INDEXES = {
+    "events": [
+        # _id is the keyset pagination tie-breaker, see app/utils/pagination.py
+        IndexModel([("created_by", ASCENDING), ("start_time", ASCENDING), ("_id", ASCENDING)], name="created_by_start_time"),
+        IndexModel([("collaborators.user_id", ASCENDING), ("start_time", ASCENDING), ("_id", ASCENDING)], name="collaborators_user_id_start_time"),
+        # ETag freshness checks read updated_at from this index alone (covered query)
+        IndexModel([("_id", ASCENDING), ("updated_at", ASCENDING)], name="id_updated_at"),
+        # free/busy loads calendars by collaborator email too (events created with collaborators inline)
+        IndexModel([("collaborators.email", ASCENDING), ("start_time", ASCENDING)], name="collaborators_email_start_time"),
+    ],
+    "event_versions": [
+        # (timestamp, _id) is the version order used to resolve delta chains
+        IndexModel([("event_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)], name="event_id_timestamp"),
+        # one writer per seq: concurrent record_version calls retry instead of sharing a head
+        IndexModel([("event_id", ASCENDING), ("seq", ASCENDING)], name="event_id_seq_unique", unique=True,
+                   partialFilterExpression={"seq": {"$exists": True}}),
+    ],
+    "event_version_diffs": [
+        # memoized diffs are looked up by _id; this one is for clearing an event's diffs
+        IndexModel([("event_id", ASCENDING)], name="event_id"),
+    ],
+    "event_access": [
+        # both cover their lookups: permission checks by (event, user), and list
+        # pages by user, walked in the (start_time, _id) list order
+        IndexModel([("event_id", ASCENDING), ("user", ASCENDING), ("role", ASCENDING), ("can_view", ASCENDING), ("can_edit", ASCENDING)], name="event_user_access"),
+        IndexModel([("user", ASCENDING), ("listed", ASCENDING), ("start_time", ASCENDING), ("event_id", ASCENDING), ("is_recurring", ASCENDING)], name="user_listed_start_time"),
+    ],
+    "refresh_tokens": [
+        # tokens are stored under _id = hash of the token; this only serves rows from before that
+        IndexModel([("token", ASCENDING)], name="legacy_token", partialFilterExpression={"token": {"$exists": True}}),
+        # reuse of a rotated token revokes its whole family
+        IndexModel([("family", ASCENDING)], name="family"),
+        # expired refresh tokens are purged by mongo's TTL monitor
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        # shared rate limiter state (RATE_LIMIT_BACKEND=mongo); idle buckets and slots are purged
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "permissions": [
+        IndexModel([("role", ASCENDING)], name="role_unique", unique=True),
+    ],
+    "roles": [
+        IndexModel([("role", ASCENDING)], name="role_unique", unique=True),
+    ],
+}
+
+# index options that change how an index behaves; anything else (v, ns, ...) is ignored
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _normalize(spec: dict) -> dict:
+    normalized = {"key": [(field, direction) for field, direction in spec["key"]]}
+    for option in _COMPARED_OPTIONS:
+        value = spec.get(option)
+        # unique/sparse=False is the same as not set; expireAfterSeconds=0 is meaningful
+        if value is None or value is False:
+            continue
+        normalized[option] = value
+    return normalized
+
+
+async def ensure_indexes(db) -> dict:
+    """Create missing indexes and report drift against INDEXES.
+
+    Existing indexes are never dropped; an index whose definition differs from
+    the declared one is reported as drifted and left for an operator to fix.
+    """
+    report = {"created": [], "drifted": [], "undeclared": [], "failed": []}
+
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+
+        missing = []
+        for model in models:
+            declared = model.document
+            name = declared["name"]
+            if name not in existing:
+                missing.append(model)
+            elif _normalize(existing[name]) != _normalize(dict(declared, key=list(declared["key"].items()))):
+                report["drifted"].append(f"{collection_name}.{name}")
+
+        declared_names = {model.document["name"] for model in models} | {"_id_"}
+        report["undeclared"].extend(
+            f"{collection_name}.{name}" for name in existing if name not in declared_names
+        )
+
+        # created one by one so a single failure (e.g. duplicate emails
+        # blocking the unique index) doesn't prevent the others
+        for model in missing:
+            name = model.document["name"]
+            try:
+                await collection.create_indexes([model])
+                report["created"].append(f"{collection_name}.{name}")
+            except OperationFailure as exc:
+                report["failed"].append(f"{collection_name}.{name}")
+                logger.error(f"Failed to create index {collection_name}.{name}: {exc}")
+
+    if report["created"]:
+        logger.info(f"Created indexes: {', '.join(report['created'])}")
+    if report["drifted"]:
+        logger.warning(f"Index definitions drifted from declaration: {', '.join(report['drifted'])}")
+    if report["undeclared"]:
+        logger.warning(f"Undeclared indexes found: {', '.join(report['undeclared'])}")
+    return report
@@ -0,0 +1,144 @@
+"""Prometheus metrics served at /metrics.
+
+- HTTP: request count and latency per method and route template (not the raw
+  path, so ids don't create new series), plus requests in flight.
+- Mongo: command latency and failures per collection and command, from a
+  pymongo command listener on the shared client.
+- State owned elsewhere (collaboration rooms, TTL caches, password hashing) is
+  read only when scraped, through register_* below; nothing on the request
+  path touches it.
+
+Metrics are per process; scrape every worker (or run one worker per pod).
+"""
+import time
+from typing import Callable, Dict
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+from starlette.responses import Response
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+http_requests = Counter("http_requests_total", "HTTP requests", ["method", "route", "status"])
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=HTTP_BUCKETS)
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being handled")
+mongo_latency = Histogram("mongo_command_duration_seconds", "MongoDB command latency", ["collection", "command"], buckets=MONGO_BUCKETS)
+mongo_failures = Counter("mongo_command_failures_total", "Failed MongoDB commands", ["collection", "command"])
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; the route template is read from the scope after routing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            route = scope.get("route")
+            # unmatched paths (404s, scanners) share one series
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_latency.labels(method, template).observe(time.perf_counter() - start)
+            http_requests.labels(method, template, str(status)).inc()
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every command the driver sends; pass to AsyncIOMotorClient(event_listeners=...)."""
+
+    def __init__(self):
+        # (connection, request id) -> collection, from started until succeeded/failed
+        self._collections: Dict[tuple, str] = {}
+
+    def started(self, event):
+        command = event.command
+        target = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else "-"
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        mongo_latency.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        mongo_latency.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        mongo_failures.labels(collection, event.command_name).inc()
+
+
+class _StateCollector:
+    """Reads caches, collaboration managers and hashing stats at scrape time."""
+
+    def __init__(self):
+        self.caches: Dict[str, object] = {}
+        self.collab_managers = []
+        self.hashing_stats: Callable[[], dict] = None
+
+    def collect(self):
+        if self.caches:
+            size = GaugeMetricFamily("app_cache_entries", "Entries held by an in-process cache", labels=["cache"])
+            hits = CounterMetricFamily("app_cache_hits", "Cache hits", labels=["cache"])
+            misses = CounterMetricFamily("app_cache_misses", "Cache misses", labels=["cache"])
+            for name, cache in self.caches.items():
+                size.add_metric([name], len(cache))
+                hits.add_metric([name], cache.hits)
+                misses.add_metric([name], cache.misses)
+            yield from (size, hits, misses)
+
+        if self.collab_managers:
+            rooms = GaugeMetricFamily("collab_rooms", "Collaboration rooms with local websocket connections")
+            connections = GaugeMetricFamily("collab_connections", "Open collaboration websocket connections")
+            messages = CounterMetricFamily("collab_messages", "Collaboration messages", labels=["kind"])
+            totals = {}
+            for manager in self.collab_managers:
+                for kind, value in manager.stats.items():
+                    totals[kind] = totals.get(kind, 0) + value
+            active = [room for manager in self.collab_managers for room in list(manager.active_connections.values())]
+            rooms.add_metric([], len(active))
+            connections.add_metric([], sum(len(room) for room in active))
+            for kind, value in totals.items():
+                messages.add_metric([kind], value)
+            yield from (rooms, connections, messages)
+
+        if self.hashing_stats:
+            stats = self.hashing_stats()
+            hashing = GaugeMetricFamily("password_hashing", "Password hashing pool state and totals", labels=["stat"])
+            for stat, value in stats.items():
+                hashing.add_metric([stat], value)
+            yield hashing
+
+
+_state = _StateCollector()
+REGISTRY.register(_state)
+
+
+def register_cache(name: str, cache):
+    _state.caches[name] = cache
+
+
+def register_collab_manager(manager):
+    _state.collab_managers.append(manager)
+
+
+def register_hashing_stats(stats: Callable[[], dict]):
+    _state.hashing_stats = stats
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
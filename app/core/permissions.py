@@ -1,6 +1,7 @@
 from fastapi import Depends, HTTPException, status
 from app.api.auth import get_current_user
 from app.database import get_db
+from app.crud.roles import get_role_permissions
 
 class PermissionChecker:
     def __init__(self, resource: str, method: str):
@@ -12,12 +13,18 @@ class PermissionChecker:
         if not user.get("role_id"):
             raise HTTPException(status_code=403, detail="No role assigned")
 
+        # stateless access tokens already carry the role's permissions
+        if "token_permissions" in user:
+            if f"{self.resource}:{self.method}" not in user["token_permissions"]:
+                raise HTTPException(status_code=403, detail="Permission denied")
+            return
+
         role = user["role_id"]
-        permissions = await db["permissions"].find_one({"role": role})
-        if not permissions:
+        permissions = await get_role_permissions(db, role)
+        if permissions is None:
             raise HTTPException(status_code=403, detail="No permissions found")
 
-        resource_perms = permissions["permissions"].get(self.resource, {})
+        resource_perms = permissions.get(self.resource, {})
         if not resource_perms.get(self.method, False):
             raise HTTPException(status_code=403, detail="Permission denied")
 
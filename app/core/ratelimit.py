@@ -0,0 +1,235 @@
+"""Admission control: token-bucket rate limits and concurrency caps per route.
+
+Each rule matches a method and a path glob and is keyed per user (email from
+the bearer token, falling back to the client IP), per IP, or per route (one
+bucket shared by everyone). Requests over the limit get a 429 with Retry-After
+before any route code, auth or database work runs.
+
+Bucket and slot state lives in a backend: "memory" (per worker, the default)
+or "mongo" (shared by all workers, one atomic pipeline update per check).
+"""
+import math
+import time
+import uuid
+from abc import ABC, abstractmethod
+from fnmatch import fnmatchcase
+from typing import List, Optional, Tuple
+from jose import JWTError
+from pymongo import ReturnDocument
+from starlette.responses import JSONResponse
+from app.core.config import (
+    RATE_LIMIT_BACKEND, RATE_LIMIT_LEASE_SECONDS, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_RULES, RATE_LIMIT_TRUST_FORWARDED,
+)
+from app.database import get_db
+from app.utils.cache import TTLCache
+from app.utils.jwt import decode_access_token
+from app.utils.logger import logger
+
+# rate: tokens added per second, burst: bucket size, concurrency: requests in
+# flight per key (0 = no cap). The first matching rule applies.
+DEFAULT_RULES = [
+    # bcrypt on every call
+    {"name": "login", "method": "POST", "path": "/api/auth/login", "key": "ip", "rate": 0.2, "burst": 10, "concurrency": 2},
+    {"name": "register", "method": "POST", "path": "/api/auth/register", "key": "ip", "rate": 0.1, "burst": 5, "concurrency": 2},
+    {"name": "refresh", "method": "POST", "path": "/api/auth/refresh", "key": "ip", "rate": 1, "burst": 20, "concurrency": 0},
+    {"name": "bulk_write", "method": "POST", "path": "/api/events/batch", "key": "user", "rate": 0.5, "burst": 5, "concurrency": 2},
+    {"name": "bulk_write", "method": "POST", "path": "/api/events/import", "key": "user", "rate": 0.5, "burst": 5, "concurrency": 2},
+    {"name": "history", "method": "GET", "path": "/api/events/*/history*", "key": "user", "rate": 5, "burst": 20, "concurrency": 4},
+    {"name": "history", "method": "GET", "path": "/api/events/*/changelog", "key": "user", "rate": 5, "burst": 20, "concurrency": 4},
+    {"name": "history", "method": "GET", "path": "/api/events/*/versions/data", "key": "user", "rate": 5, "burst": 20, "concurrency": 4},
+    {"name": "history", "method": "GET", "path": "/api/events/*/diff/*", "key": "user", "rate": 5, "burst": 20, "concurrency": 4},
+]
+
+
+class RateLimitBackend(ABC):
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)."""
+
+    @abstractmethod
+    async def acquire(self, key: str, limit: int) -> Optional[str]:
+        """Claim one of `limit` concurrency slots; returns a slot id or None when all are taken."""
+
+    @abstractmethod
+    async def release(self, key: str, slot: str):
+        ...
+
+
+class MemoryBackend(RateLimitBackend):
+    # all state is per process: with N workers a client effectively gets N times the limits
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        # key -> (tokens, monotonic time of last update); an evicted bucket just starts full again
+        self.buckets = TTLCache(maxsize=max_keys, ttl=0)
+        self.in_flight = {}
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= 1:
+            self.buckets.set(key, (tokens - 1, now))
+            return True, 0.0
+        self.buckets.set(key, (tokens, now))
+        return False, (1 - tokens) / rate if rate > 0 else float(RATE_LIMIT_LEASE_SECONDS)
+
+    async def acquire(self, key: str, limit: int) -> Optional[str]:
+        count = self.in_flight.get(key, 0)
+        if count >= limit:
+            return None
+        self.in_flight[key] = count + 1
+        return key
+
+    async def release(self, key: str, slot: str):
+        count = self.in_flight.get(key, 0) - 1
+        if count > 0:
+            self.in_flight[key] = count
+        else:
+            self.in_flight.pop(key, None)
+
+
+class MongoBackend(RateLimitBackend):
+    """State shared by every worker, in the rate_limits collection.
+
+    Buckets are refilled and drawn from in a single pipeline update using the
+    server's clock ($$NOW). Concurrency slots are leases: a slot held by a
+    worker that died is reclaimed once its lease runs out. Documents expire
+    through a TTL index once idle.
+    """
+
+    def __init__(self, collection_name: str = "rate_limits", lease_seconds: int = RATE_LIMIT_LEASE_SECONDS):
+        self.collection_name = collection_name
+        self.lease_ms = lease_seconds * 1000
+
+    @property
+    def collection(self):
+        return get_db()[self.collection_name]
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$ts", "$$NOW"]}]}, 1000]}
+        refill_ms = math.ceil(burst / rate * 1000) if rate > 0 else self.lease_ms
+        doc = await self.collection.find_one_and_update(
+            {"_id": f"bucket:{key}"},
+            [
+                {"$set": {"tokens": {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "ts": "$$NOW",
+                    # idle buckets are full again after refill_ms, so they can go
+                    "expires_at": {"$add": ["$$NOW", refill_ms]},
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["allowed"]:
+            return True, 0.0
+        return False, (1 - doc["tokens"]) / rate if rate > 0 else self.lease_ms / 1000
+
+    async def acquire(self, key: str, limit: int) -> Optional[str]:
+        slot = uuid.uuid4().hex
+        live = {"$filter": {"input": {"$ifNull": ["$holders", []]}, "cond": {"$gt": ["$$this.exp", "$$NOW"]}}}
+        doc = await self.collection.find_one_and_update(
+            {"_id": f"slots:{key}"},
+            [
+                {"$set": {"holders": live}},
+                {"$set": {
+                    "holders": {"$cond": [
+                        {"$lt": [{"$size": "$holders"}, limit]},
+                        {"$concatArrays": ["$holders", [{"id": slot, "exp": {"$add": ["$$NOW", self.lease_ms]}}]]},
+                        "$holders",
+                    ]},
+                    "expires_at": {"$add": ["$$NOW", self.lease_ms]},
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return slot if any(holder["id"] == slot for holder in doc["holders"]) else None
+
+    async def release(self, key: str, slot: str):
+        await self.collection.update_one({"_id": f"slots:{key}"}, {"$pull": {"holders": {"id": slot}}})
+
+
+def create_backend() -> RateLimitBackend:
+    if RATE_LIMIT_BACKEND == "mongo":
+        return MongoBackend()
+    return MemoryBackend()
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware so rejected requests cost no more than a dict lookup."""
+
+    def __init__(self, app, rules: List[dict] = None, backend: RateLimitBackend = None):
+        self.app = app
+        self.rules = rules if rules is not None else (RATE_LIMIT_RULES or DEFAULT_RULES)
+        self.backend = backend or create_backend()
+
+    def match(self, method: str, path: str) -> Optional[dict]:
+        for rule in self.rules:
+            if rule.get("method", "*") in ("*", method) and fnmatchcase(path, rule["path"]):
+                return rule
+        return None
+
+    def client_ip(self, scope) -> str:
+        if RATE_LIMIT_TRUST_FORWARDED:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def identity(self, rule: dict, scope) -> str:
+        if rule.get("key") == "route":
+            return "*"
+        if rule.get("key") == "user":
+            for name, value in scope.get("headers", ()):
+                if name == b"authorization":
+                    scheme, _, token = value.decode("latin-1").partition(" ")
+                    if scheme.lower() == "bearer" and token:
+                        try:
+                            email = decode_access_token(token).get("email")
+                        except JWTError:
+                            email = None
+                        if email:
+                            return f"user:{email}"
+                    break
+        return f"ip:{self.client_ip(scope)}"
+
+    async def __call__(self, scope, receive, send):
+        rule = self.match(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{rule.get('name', rule['path'])}:{self.identity(rule, scope)}"
+        slot = None
+        try:
+            allowed, retry_after = await self.backend.take(key, rule["rate"], rule["burst"])
+            if allowed and rule.get("concurrency"):
+                slot = await self.backend.acquire(key, rule["concurrency"])
+                if slot is None:
+                    allowed, retry_after = False, 1.0
+        except Exception as exc:
+            # a broken backend must not take the API down with it
+            logger.error(f"Rate limit backend failed, letting request through: {exc}")
+            allowed, slot = True, None
+
+        if not allowed:
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if slot is not None:
+                try:
+                    await self.backend.release(key, slot)
+                except Exception as exc:
+                    logger.error(f"Rate limit backend failed to release a slot: {exc}")
@@ -1,9 +1,89 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
+from app.core.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt is CPU bound and takes tens of milliseconds; it runs on this pool so
+# the event loop keeps serving other requests. max_workers caps concurrency,
+# anything beyond that waits in the executor queue.
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_stats_lock = threading.Lock()
+_stats = {
+    "workers": PASSWORD_HASH_WORKERS,
+    "queued": 0,
+    "running": 0,
+    "completed": 0,
+    "max_queue_depth": 0,
+    "total_wait_seconds": 0.0,
+    "total_hash_seconds": 0.0,
+}
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain, hashed):
     return pwd_context.verify(plain, hashed)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
+
+def password_needs_rehash(hashed) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+hash>
+    try:
+        rounds = int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != BCRYPT_ROUNDS or pwd_context.needs_update(hashed)
+
+
+async def _run_hashing(func, *args):
+    enqueued_at = time.perf_counter()
+    with _stats_lock:
+        _stats["queued"] += 1
+        _stats["max_queue_depth"] = max(_stats["max_queue_depth"], _stats["queued"])
+
+    # whichever of job() and the caller's cleanup gets here first takes the call off the queue
+    state = {"dequeued": False}
+
+    def job():
+        started_at = time.perf_counter()
+        with _stats_lock:
+            if not state["dequeued"]:
+                state["dequeued"] = True
+                _stats["queued"] -= 1
+            _stats["running"] += 1
+            _stats["total_wait_seconds"] += started_at - enqueued_at
+        try:
+            return func(*args)
+        finally:
+            with _stats_lock:
+                _stats["running"] -= 1
+                _stats["completed"] += 1
+                _stats["total_hash_seconds"] += time.perf_counter() - started_at
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, job)
+    finally:
+        # a caller cancelled while queued (client gone, timeout) never runs job()
+        with _stats_lock:
+            if not state["dequeued"]:
+                state["dequeued"] = True
+                _stats["queued"] -= 1
+
+
+async def verify_password_async(plain, hashed) -> bool:
+    return await _run_hashing(verify_password, plain, hashed)
+
+async def get_password_hash_async(password) -> str:
+    return await _run_hashing(get_password_hash, password)
+
+
+def get_hashing_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    completed = stats["completed"] or 1
+    stats["avg_wait_ms"] = round(stats["total_wait_seconds"] / completed * 1000, 2)
+    stats["avg_hash_ms"] = round(stats["total_hash_seconds"] / completed * 1000, 2)
+    return stats
@@ -0,0 +1,37 @@
+from app.core.config import PERMISSION_CACHE_MAX_SIZE, PERMISSION_CACHE_TTL_SECONDS
+from app.utils.cache import TTLCache
+
+# role -> permissions map (or None when the role has no permissions document).
+# Negative results are cached too so unknown roles don't hit Mongo on every request.
+permission_cache = TTLCache(maxsize=PERMISSION_CACHE_MAX_SIZE, ttl=PERMISSION_CACHE_TTL_SECONDS)
+
+_NOT_CACHED = object()
+
+
+async def get_role_permissions(db, role: str):
+    permissions = permission_cache.get(role, _NOT_CACHED)
+    if permissions is not _NOT_CACHED:
+        return permissions
+
+    doc = await db["permissions"].find_one({"role": role}, {"_id": 0, "permissions": 1})
+    permissions = doc.get("permissions", {}) if doc else None
+    permission_cache.set(role, permissions)
+    return permissions
+
+
+def invalidate_role_permissions(role: str = None):
+    # Called after every write to the roles/permissions collections
+    if role is None:
+        permission_cache.clear()
+    else:
+        permission_cache.pop(role)
+
+
+def compact_permissions(permissions) -> list:
+    # {"events": {"GET": True, "PUT": False}} -> ["events:GET"]; used as a JWT claim
+    return sorted(
+        f"{resource}:{method}"
+        for resource, methods in (permissions or {}).items()
+        for method, allowed in methods.items()
+        if allowed
+    )
@@ -2,6 +2,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi import Request
 from dotenv import load_dotenv
 import os
+from app.core.config import METRICS_ENABLED, METRICS_MONGO_COMMANDS
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,7 +15,12 @@ MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
 
 
 # MONGO_URI = "mongodb://localhost:27017"
-client = AsyncIOMotorClient(MONGO_URI)
+# command latency per collection for /metrics
+event_listeners = []
+if METRICS_ENABLED and METRICS_MONGO_COMMANDS:
+    from app.core.metrics import MongoCommandMetrics
+    event_listeners.append(MongoCommandMetrics())
+client = AsyncIOMotorClient(MONGO_URI, event_listeners=event_listeners)
 db = None
 
 async def connect_db():
@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from app.api import auth, users, roles, events, collaboration,eventVersion
 from app.database import connect_db, get_db
+from app.core.config import ENSURE_INDEXES_ON_STARTUP, METRICS_ENABLED, RATE_LIMIT_ENABLED
+from app.core.metrics import MetricsMiddleware, metrics_response, register_cache, register_collab_manager, register_hashing_stats
+from app.core.ratelimit import RateLimitMiddleware
+from app.core.indexes import ensure_indexes
 from fastapi.middleware.cors import CORSMiddleware
 import datetime
 
@@ -18,6 +22,15 @@ async def health_check():
 async def version():
     return {"version": "1.0.0"}
 
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return metrics_response()
+
+# inside CORS (so browsers can read 429s) but ahead of routing and auth
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,6 +39,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# outermost, so rejected (429) and CORS preflight requests are counted too
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 
 # Register routes
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
@@ -35,11 +52,41 @@ app.include_router(events.router, prefix="/api", tags=["Events"])
 app.include_router(collaboration.router, prefix="/api", tags=["Collaboration"])
 app.include_router(eventVersion.router, prefix="/api", tags=["Event Versioning"])
 
+if METRICS_ENABLED:
+    from app.api.auth import token_epoch_cache
+    from app.core.security import get_hashing_stats
+    from app.crud.roles import permission_cache
+    from app.services.freebusy import busy_cache
+    from app.services.list_cache import event_list_cache
+    from app.services.recurrence import occurrence_cache
+    from app.services.versioning import version_diff_cache
+
+    register_cache("permissions", permission_cache)
+    register_cache("token_epochs", token_epoch_cache)
+    register_cache("event_lists", event_list_cache)
+    register_cache("freebusy", busy_cache)
+    register_cache("occurrences", occurrence_cache)
+    register_cache("version_diffs", version_diff_cache)
+    register_collab_manager(eventVersion.manager)
+    register_hashing_stats(get_hashing_stats)
+
+
 @app.on_event("startup")
 async def startup_db():
     await connect_db()
 
 
+@app.on_event("startup")
+async def create_indexes():
+    if ENSURE_INDEXES_ON_STARTUP:
+        app.state.index_report = await ensure_indexes(get_db())
+
+
+@app.on_event("shutdown")
+async def stop_collaboration_broker():
+    await eventVersion.manager.close()
+
+
 #take this username and password from terminal
 @app.on_event("startup")
 async def create_owner_user():
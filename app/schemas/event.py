@@ -31,3 +31,27 @@ class EventInDB(EventBase):
     updated_at: datetime
 
 
+# Partial update used by bulk edits: only the fields that are set get applied
+class EventPatch(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    location: Optional[str] = None
+    is_recurring: Optional[bool] = None
+    reccurrence_pattern: Optional[str] = None
+
+class EventBulkUpdate(BaseModel):
+    event_ids: List[str] = Field(..., min_length=1, max_length=1000)
+    changes: EventPatch = EventPatch()
+    shift_minutes: Optional[int] = None  # move start_time/end_time of every event, e.g. 10080 = one week
+
+class EventBulkDelete(BaseModel):
+    event_ids: List[str] = Field(..., min_length=1, max_length=1000)
+
+
+# Free/busy for several users at once, e.g. to find a meeting slot
+class FreeBusyRequest(BaseModel):
+    users: List[str] = Field(..., min_length=1, max_length=100)  # emails or user ids
+    start: datetime
+    end: datetime
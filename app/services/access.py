@@ -0,0 +1,186 @@
+"""Materialized per-user event access (the event_access collection).
+
+One entry per (event, user) the event concerns: the creator, every inline
+collaborator (by email) and every shared collaborator (by user_id). Entries
+record exactly what the event-document checks decide, so EVENT_ACCESS_READS
+changes how access is resolved, never who gets it:
+
+- can_view / can_edit: _can_view / _can_edit (creator, or an inline
+  collaborator whose permissions grant view / edit)
+- listed: the GET /api/events visibility filter (creator, or shared by user_id)
+
+With EVENT_ACCESS_READS enabled, permission checks and list pages run as
+index scans over this collection instead of over event documents. Writes keep
+it in sync regardless of that setting; `python -m app.services.access rebuild`
+backfills existing data.
+"""
+from typing import List
+from bson import ObjectId
+from pymongo import ASCENDING, DeleteMany, ReplaceOne
+from app.utils.logger import logger
+
+
+def access_entries(event: dict) -> List[dict]:
+    """Expected event_access entries for an event document."""
+    event_id = ObjectId(event["_id"])
+    grants = {}
+
+    def grant(user):
+        return grants.setdefault(user, {"role": None, "listed": False, "can_view": False, "can_edit": False})
+
+    if event.get("created_by"):
+        grant(event["created_by"]).update(role="owner", listed=True, can_view=True, can_edit=True)
+    seen_emails = set()
+    for collaborator in event.get("collaborators") or []:
+        email = collaborator.get("email")
+        # _can_view/_can_edit only look at the first inline entry for an email
+        if email and email not in seen_emails and email != event.get("created_by"):
+            seen_emails.add(email)
+            permissions = collaborator.get("permissions") or {}
+            entry = grant(email)
+            entry["role"] = entry["role"] or collaborator.get("role") or "collaborator"
+            entry["can_view"] = bool(permissions.get("view", False))
+            entry["can_edit"] = bool(permissions.get("edit", False))
+        if collaborator.get("user_id"):
+            entry = grant(collaborator["user_id"])
+            entry["role"] = entry["role"] or collaborator.get("role")
+            entry["listed"] = True
+
+    return [
+        {
+            "_id": f"{event_id}:{user}",
+            "user": user,
+            "event_id": event_id,
+            "start_time": event.get("start_time"),
+            "is_recurring": bool(event.get("is_recurring")),
+            **entry,
+        }
+        for user, entry in grants.items()
+    ]
+
+
+def _sync_ops(events: List[dict]) -> list:
+    ops = []
+    for event in events:
+        entries = access_entries(event)
+        ops.extend(ReplaceOne({"_id": entry["_id"]}, entry, upsert=True) for entry in entries)
+        # users who lost access
+        ops.append(DeleteMany({"event_id": ObjectId(event["_id"]), "_id": {"$nin": [entry["_id"] for entry in entries]}}))
+    return ops
+
+
+async def sync_event_access(db, *events: dict):
+    """Bring the entries of these (full, post-write) event documents up to date."""
+    ops = _sync_ops(events)
+    if ops:
+        await db["event_access"].bulk_write(ops, ordered=False)
+
+
+async def remove_event_access(db, *event_ids):
+    if event_ids:
+        await db["event_access"].delete_many({"event_id": {"$in": [ObjectId(event_id) for event_id in event_ids]}})
+
+
+async def get_access(db, event_id: str, user: str):
+    # covered by event_user_access
+    return await db["event_access"].find_one(
+        {"event_id": ObjectId(event_id), "user": user},
+        {"_id": 0, "can_view": 1, "can_edit": 1, "role": 1},
+    )
+
+
+def listed_query(user: str, start_time: dict = None, is_recurring=None) -> dict:
+    """event_access filter for the events `user` sees in GET /api/events."""
+    query = {"user": user, "listed": True}
+    if start_time:
+        query["start_time"] = start_time
+    if is_recurring is not None:
+        query["is_recurring"] = is_recurring
+    return query
+
+
+async def listed_page(db, query: dict, skip: int = 0, limit: int = 0) -> list:
+    """Event ids for one page in (start_time, _id) order, read from user_listed_start_time alone."""
+    cursor = db["event_access"].find(query, {"_id": 0, "event_id": 1}).sort([("start_time", ASCENDING), ("event_id", ASCENDING)])
+    if skip:
+        cursor = cursor.skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+    return [entry["event_id"] async for entry in cursor]
+
+
+async def count_listed(db, query: dict) -> int:
+    return await db["event_access"].count_documents(query)
+
+
+async def rebuild_event_access(db, batch_size: int = 1000) -> dict:
+    """Recompute every entry from the events collection. Safe to re-run."""
+    stats = {"events": 0, "entries": 0, "orphans_removed": 0}
+    batch = []
+
+    async def flush():
+        ops = _sync_ops(batch)
+        if ops:
+            await db["event_access"].bulk_write(ops, ordered=False)
+        batch.clear()
+
+    projection = {"created_by": 1, "collaborators": 1, "start_time": 1, "is_recurring": 1}
+    async for event in db["events"].find({}, projection).batch_size(batch_size):
+        batch.append(event)
+        stats["events"] += 1
+        stats["entries"] += len(access_entries(event))
+        if len(batch) >= batch_size:
+            await flush()
+    await flush()
+
+    # entries of events that no longer exist
+    existing = set(await db["events"].distinct("_id"))
+    orphans = [event_id for event_id in await db["event_access"].distinct("event_id") if event_id not in existing]
+    if orphans:
+        result = await db["event_access"].delete_many({"event_id": {"$in": orphans}})
+        stats["orphans_removed"] = result.deleted_count
+
+    logger.info(f"Rebuilt event_access: {stats}")
+    return stats
+
+
+async def verify_event_access(db) -> dict:
+    """Compare event_access with what the events collection implies, without writing."""
+    report = {"events": 0, "missing": 0, "stale": 0, "mismatched": 0}
+    expected_ids = set()
+    projection = {"created_by": 1, "collaborators": 1, "start_time": 1, "is_recurring": 1}
+    async for event in db["events"].find({}, projection):
+        report["events"] += 1
+        expected = {entry["_id"]: entry for entry in access_entries(event)}
+        expected_ids.update(expected)
+        stored = {entry["_id"]: entry async for entry in db["event_access"].find({"event_id": event["_id"]})}
+        for entry_id, entry in expected.items():
+            if entry_id not in stored:
+                report["missing"] += 1
+            elif stored[entry_id] != entry:
+                report["mismatched"] += 1
+
+    async for entry in db["event_access"].find({}, {"_id": 1}):
+        if entry["_id"] not in expected_ids:
+            report["stale"] += 1
+    report["ok"] = not (report["missing"] or report["stale"] or report["mismatched"])
+    return report
+
+
+if __name__ == "__main__":
+    # python -m app.services.access [rebuild|verify]
+    import asyncio
+    import sys
+    from app.database import connect_db, get_db
+
+    async def _main():
+        await connect_db()
+        command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+        if command == "rebuild":
+            print(await rebuild_event_access(get_db()))
+        else:
+            report = await verify_event_access(get_db())
+            print(report)
+            sys.exit(0 if report["ok"] else 1)
+
+    asyncio.run(_main())
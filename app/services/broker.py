@@ -0,0 +1,153 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Set
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure
+from app.core.config import COLLAB_BROKER, COLLAB_BROKER_CAPPED_BYTES, COLLAB_BROKER_COLLECTION
+from app.database import get_db
+from app.utils.logger import logger
+
+# deliver(event_id, text) is CollaborationManager's local fan-out. Brokers call it
+# only for messages published by *other* managers; the publisher delivers its own
+# messages to its local sockets directly.
+Deliver = Callable[[str, str], None]
+
+
+class MessageBroker(ABC):
+    """Forwards room messages between CollaborationManager instances."""
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+
+    @abstractmethod
+    def subscribe(self, event_id: str):
+        ...
+
+    @abstractmethod
+    def unsubscribe(self, event_id: str):
+        ...
+
+    @abstractmethod
+    async def publish(self, event_id: str, text: str):
+        ...
+
+    async def close(self):
+        pass
+
+
+class InProcessBroker(MessageBroker):
+    # managers living in the same process; a single uvicorn worker needs nothing more
+    _subscribers: Dict[str, Set[Deliver]] = {}
+
+    def subscribe(self, event_id: str):
+        self._subscribers.setdefault(event_id, set()).add(self.deliver)
+
+    def unsubscribe(self, event_id: str):
+        room = self._subscribers.get(event_id)
+        if room is not None:
+            room.discard(self.deliver)
+            if not room:
+                del self._subscribers[event_id]
+
+    async def publish(self, event_id: str, text: str):
+        for deliver in list(self._subscribers.get(event_id, ())):
+            if deliver is not self.deliver:
+                deliver(event_id, text)
+
+
+class MongoBroker(MessageBroker):
+    """Cross-process broker over a capped collection tailed with an awaitable cursor.
+
+    The tail only matches rooms this process has local sockets for; it is
+    re-opened whenever that set changes. Ids from different processes aren't
+    strictly ordered, so a re-opened tail resumes a little before the last seen
+    message and skips ids it already delivered.
+    """
+
+    RESUME_SLACK = timedelta(seconds=2)
+
+    def __init__(self, collection_name: str = COLLAB_BROKER_COLLECTION, capped_bytes: int = COLLAB_BROKER_CAPPED_BYTES,
+                 max_await_ms: int = 500, retry_seconds: float = 1.0):
+        self.collection_name = collection_name
+        self.capped_bytes = capped_bytes
+        self.max_await_ms = max_await_ms
+        self.retry_seconds = retry_seconds
+        self.origin = uuid.uuid4().hex
+        self.rooms: Set[str] = set()
+        self._rooms_changed = asyncio.Event()
+        self._last_ts = None
+        self._seen = deque(maxlen=1000)
+        self._task: asyncio.Task = None
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        db = get_db()
+        try:
+            await db.create_collection(self.collection_name, capped=True, size=self.capped_bytes)
+            # a tailable cursor on an empty capped collection dies immediately
+            await db[self.collection_name].insert_one({"room": None, "origin": self.origin, "ts": datetime.utcnow()})
+        except (CollectionInvalid, OperationFailure):
+            pass  # already exists
+        self.collection = db[self.collection_name]
+
+        self._last_ts = datetime.utcnow()
+        self._task = asyncio.create_task(self._tail())
+
+    def subscribe(self, event_id: str):
+        if event_id not in self.rooms:
+            self.rooms.add(event_id)
+            self._rooms_changed.set()
+
+    def unsubscribe(self, event_id: str):
+        if event_id in self.rooms:
+            self.rooms.discard(event_id)
+            self._rooms_changed.set()
+
+    async def publish(self, event_id: str, text: str):
+        await self.collection.insert_one({"room": event_id, "text": text, "origin": self.origin, "ts": datetime.utcnow()})
+
+    async def _tail(self):
+        while True:
+            self._rooms_changed.clear()
+            if not self.rooms:
+                await self._rooms_changed.wait()
+                continue
+
+            query = {
+                "room": {"$in": list(self.rooms)},
+                "origin": {"$ne": self.origin},
+                "ts": {"$gte": self._last_ts - self.RESUME_SLACK},
+            }
+            cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT).max_await_time_ms(self.max_await_ms)
+            try:
+                # each pass ends after max_await_ms without new messages, so room
+                # changes are picked up within that window
+                while cursor.alive and not self._rooms_changed.is_set():
+                    async for doc in cursor:
+                        if doc["_id"] in self._seen:
+                            continue
+                        self._seen.append(doc["_id"])
+                        self._last_ts = max(self._last_ts, doc["ts"])
+                        self.deliver(doc["room"], doc["text"])
+                if not cursor.alive and not self._rooms_changed.is_set():
+                    await asyncio.sleep(self.retry_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"Collaboration broker tail failed, retrying: {exc}")
+                await asyncio.sleep(self.retry_seconds)
+            finally:
+                await cursor.close()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+
+
+def create_broker() -> MessageBroker:
+    if COLLAB_BROKER == "mongo":
+        return MongoBroker()
+    return InProcessBroker()
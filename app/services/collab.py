@@ -1,21 +1,117 @@
+import asyncio
+import json
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Dict
+from app.core.config import COLLAB_SEND_QUEUE_SIZE, COLLAB_SEND_TIMEOUT_SECONDS, COLLAB_SLOW_CONSUMER_POLICY
+from app.services.broker import MessageBroker, create_broker
+from app.utils.logger import logger
+
+
+class _Connection:
+    # one websocket plus its bounded outbox and the task draining it
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: asyncio.Task = None
+
 
 class CollaborationManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    def __init__(self, queue_size: int = COLLAB_SEND_QUEUE_SIZE, slow_consumer_policy: str = COLLAB_SLOW_CONSUMER_POLICY,
+                 send_timeout: float = COLLAB_SEND_TIMEOUT_SECONDS, broker: MessageBroker = None):
+        self.active_connections: Dict[str, Dict[WebSocket, _Connection]] = {}
+        # rooms are shared with other workers through the broker; this process
+        # only subscribes to rooms it has local sockets for
+        self.broker = broker or create_broker()
+        self._broker_started = False
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout = send_timeout
+        self.stats = {"messages_broadcast": 0, "messages_received": 0, "messages_sent": 0, "messages_coalesced": 0, "slow_consumers_dropped": 0}
 
     async def connect(self, event_id: str, websocket: WebSocket):
         await websocket.accept()
+        if not self._broker_started:
+            self._broker_started = True
+            await self.broker.start(self._deliver_remote)
+        connection = _Connection(websocket, self.queue_size)
+        connection.task = asyncio.create_task(self._drain(event_id, connection))
         if event_id not in self.active_connections:
-            self.active_connections[event_id] = []
-        self.active_connections[event_id].append(websocket)
+            self.active_connections[event_id] = {}
+            self.broker.subscribe(event_id)
+        self.active_connections[event_id][websocket] = connection
 
     def disconnect(self, event_id: str, websocket: WebSocket):
-        self.active_connections[event_id].remove(websocket)
-        if not self.active_connections[event_id]:
+        # may already have been removed when it was dropped as a slow consumer
+        room = self.active_connections.get(event_id)
+        if room is None:
+            return
+        connection = room.pop(websocket, None)
+        if connection and connection.task is not asyncio.current_task():
+            connection.task.cancel()
+        if not room:
             del self.active_connections[event_id]
+            self.broker.unsubscribe(event_id)
 
     async def broadcast(self, event_id: str, message: dict):
-        for connection in self.active_connections.get(event_id, []):
-            await connection.send_json(message)
+        # serialized once, then handed to every connection's queue without awaiting any socket
+        text = json.dumps(message)
+        self.stats["messages_broadcast"] += 1
+        self._fan_out(event_id, text)
+        await self.broker.publish(event_id, text)
+
+    def _deliver_remote(self, event_id: str, text: str):
+        # a message broadcast by another worker
+        self.stats["messages_received"] += 1
+        self._fan_out(event_id, text)
+
+    def _fan_out(self, event_id: str, text: str):
+        for connection in list(self.active_connections.get(event_id, {}).values()):
+            self._enqueue(event_id, connection, text)
+
+    def _enqueue(self, event_id: str, connection: _Connection, text: str):
+        try:
+            connection.queue.put_nowait(text)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == "drop":
+            self._drop_slow_consumer(event_id, connection, "send queue full")
+            return
+
+        # coalesce: the oldest pending message is discarded in favour of the newest
+        connection.queue.get_nowait()
+        connection.queue.put_nowait(text)
+        self.stats["messages_coalesced"] += 1
+
+    def _drop_slow_consumer(self, event_id: str, connection: _Connection, reason: str):
+        logger.warning(f"Dropping slow collaboration client on event {event_id}: {reason}")
+        self.stats["slow_consumers_dropped"] += 1
+        self.disconnect(event_id, connection.websocket)
+        asyncio.create_task(self._close(connection.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # try again later
+        except Exception:
+            pass
+
+    async def _drain(self, event_id: str, connection: _Connection):
+        while True:
+            text = await connection.queue.get()
+            try:
+                await asyncio.wait_for(connection.websocket.send_text(text), timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                self._drop_slow_consumer(event_id, connection, f"send took longer than {self.send_timeout}s")
+                return
+            except Exception:
+                # client went away; its receive loop will see the disconnect too
+                self.disconnect(event_id, connection.websocket)
+                return
+            self.stats["messages_sent"] += 1
+
+    def room_sizes(self) -> Dict[str, int]:
+        return {event_id: len(room) for event_id, room in self.active_connections.items()}
+
+    async def close(self):
+        await self.broker.close()
@@ -0,0 +1,156 @@
+"""Free/busy lookups over each user's events.
+
+A user's calendar (events they created or collaborate on) is loaded once into
+an IntervalIndex and cached; recurring series are kept aside and expanded only
+over the queried range.
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Tuple
+from bson import ObjectId
+from app.core.config import FREEBUSY_CACHE_MAX_SIZE, FREEBUSY_CACHE_TTL_SECONDS
+from app.services.recurrence import occurrence_starts
+from app.utils.cache import TTLCache
+
+# (start, end, event_id)
+Interval = Tuple[datetime, datetime, str]
+
+# email -> {user id or None: (IntervalIndex of one-off events, recurring series)}.
+# The calendar differs with the user id (events shared by id), so each identity
+# pair is cached on its own; invalidating an email drops all of them.
+busy_cache = TTLCache(maxsize=FREEBUSY_CACHE_MAX_SIZE, ttl=FREEBUSY_CACHE_TTL_SECONDS)
+# collaborator user_id -> email, so an event naming a user by id invalidates the right entry
+_aliases = TTLCache(maxsize=FREEBUSY_CACHE_MAX_SIZE, ttl=0)
+
+
+class IntervalIndex:
+    """Static augmented interval tree.
+
+    Intervals are sorted by start and viewed as a balanced tree (each slice's
+    middle element is its root); every root also stores the largest end in its
+    slice. Overlap queries skip whole slices that end too early or start too
+    late, so they cost O(log n + k) for k matches.
+    """
+
+    def __init__(self, intervals: List[Interval]):
+        self._items = sorted(intervals)
+        self._max_end = [None] * len(self._items)
+        self._build(0, len(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def _build(self, lo: int, hi: int):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        max_end = self._items[mid][1]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > max_end:
+                max_end = child
+        self._max_end[mid] = max_end
+        return max_end
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Interval]:
+        """Intervals with item_start < end and item_end > start, in start order."""
+        found = []
+        self._collect(0, len(self._items), start, end, found)
+        return found
+
+    def _collect(self, lo: int, hi: int, start: datetime, end: datetime, found: list):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            return  # everything in this slice is over before the range starts
+        self._collect(lo, mid, start, end, found)
+        item = self._items[mid]
+        if item[0] < end:
+            if item[1] > start:
+                found.append(item)
+            # the right slice starts at or after item[0]
+            self._collect(mid + 1, hi, start, end, found)
+
+
+def merge_busy(intervals: List[Interval]) -> List[dict]:
+    """Collapse overlapping or touching intervals (sorted by start) into busy blocks."""
+    blocks = []
+    for start, end, _ in intervals:
+        if blocks and start <= blocks[-1]["end"]:
+            blocks[-1]["end"] = max(blocks[-1]["end"], end)
+        else:
+            blocks.append({"start": start, "end": end})
+    return blocks
+
+
+async def resolve_user(db, identifier: str):
+    """(email, user id) for an email or user id, or None if there is no such user."""
+    query = {"_id": ObjectId(identifier)} if ObjectId.is_valid(identifier) else {"email": identifier}
+    user = await db["users"].find_one(query, {"email": 1})
+    return (user["email"], str(user["_id"])) if user else None
+
+
+async def _load_calendar(db, email: str, user_id: str = None):
+    calendars = busy_cache.get(email)
+    if calendars is not None and user_id in calendars:
+        return calendars[user_id]
+
+    members = [email] + ([user_id] if user_id else [])
+    query = {"$or": [
+        {"created_by": email},
+        {"collaborators.email": email},
+        {"collaborators.user_id": {"$in": members}},
+    ]}
+    one_off, series = [], []
+    projection = {"start_time": 1, "end_time": 1, "is_recurring": 1, "reccurrence_pattern": 1}
+    async for event in db["events"].find(query, projection):
+        start, end = event.get("start_time"), event.get("end_time")
+        if not (isinstance(start, datetime) and isinstance(end, datetime)) or end <= start:
+            continue
+        if event.get("is_recurring"):
+            series.append(event)
+        else:
+            one_off.append((start, end, str(event["_id"])))
+
+    calendar = (IntervalIndex(one_off), series)
+    if calendars is None:
+        calendars = {}
+        busy_cache.set(email, calendars)
+    # added in place: it expires with the entry, never later than the TTL
+    calendars[user_id] = calendar
+    if user_id:
+        _aliases.set(user_id, email)
+    return calendar
+
+
+async def find_overlaps(db, email: str, start: datetime, end: datetime, user_id: str = None) -> List[Interval]:
+    """The user's events (and recurring occurrences) overlapping [start, end), by start."""
+    index, series = await _load_calendar(db, email, user_id)
+    found = index.overlapping(start, end)
+    for event in series:
+        duration = event["end_time"] - event["start_time"]
+        # occurrences that started up to one duration before the range can still be running
+        for occurrence in occurrence_starts(event["start_time"], event.get("reccurrence_pattern"), start - duration, end):
+            if occurrence < end and occurrence + duration > start:
+                found.append((occurrence, occurrence + duration, str(event["_id"])))
+    if series:
+        found.sort()
+    return found
+
+
+async def get_busy(db, users: List[Tuple[str, str]], start: datetime, end: datetime) -> Dict[str, List[dict]]:
+    """Merged busy blocks per (email, user id), looked up concurrently."""
+    overlaps = await asyncio.gather(*(find_overlaps(db, email, start, end, user_id) for email, user_id in users))
+    return {email: merge_busy(found) for (email, _), found in zip(users, overlaps)}
+
+
+def invalidate_busy(identifier: str = None):
+    # identifier is an email or a collaborator user_id
+    if identifier is None:
+        busy_cache.clear()
+        _aliases.clear()
+        return
+    busy_cache.pop(identifier)
+    email = _aliases.pop(identifier)
+    if email:
+        busy_cache.pop(email)
@@ -0,0 +1,27 @@
+"""Cache invalidation for event writes.
+
+Routes that create, change or delete events call events_changed with the
+affected documents (the stored event and/or the values written) so every
+derived per-event and per-user cache drops what the write made stale.
+"""
+from app.services.freebusy import invalidate_busy
+from app.services.list_cache import invalidate_lists
+from app.services.recurrence import invalidate_occurrences
+
+
+def _participants(event: dict):
+    yield event.get("created_by")
+    for collaborator in event.get("collaborators") or []:
+        yield collaborator.get("email")
+        yield collaborator.get("user_id")
+
+
+def events_changed(*events: dict):
+    users = set()
+    for event in events:
+        if event.get("_id") is not None:
+            invalidate_occurrences(event["_id"])
+        users.update(user for user in _participants(event) if user)
+    for user in users:
+        invalidate_busy(user)
+    invalidate_lists(users)
@@ -0,0 +1,88 @@
+"""Rendered GET /api/events responses, cached per user and normalized query.
+
+Each entry records the generation of every subject it depends on: the user's
+email, or ANY_EVENT for queries that can see any event. events_changed bumps
+the generations of an event's participants (and ANY_EVENT), so exactly the
+lists that could contain that event turn into misses.
+
+Generations live in this worker only. A write handled by another worker is not
+seen here: its lists stay cached until EVENT_LIST_CACHE_TTL_SECONDS runs out,
+which is the only freshness guarantee across workers.
+"""
+import itertools
+import time
+from collections import OrderedDict
+from typing import Iterable
+from app.core.config import EVENT_LIST_CACHE_ENABLED, EVENT_LIST_CACHE_MAX_SIZE, EVENT_LIST_CACHE_TTL_SECONDS
+from app.utils.cache import TTLCache
+
+ANY_EVENT = "*"
+
+# key -> (response body, ((subject, generation), ...))
+event_list_cache = TTLCache(maxsize=EVENT_LIST_CACHE_MAX_SIZE, ttl=EVENT_LIST_CACHE_TTL_SECONDS)
+# subject -> (generation, monotonic time of the bump), oldest bump first. Generations
+# come from one counter and never repeat, and a subject unseen reads as 0: once a
+# bump is older than the TTL every entry stored before it has expired, so the
+# subject can be forgotten without an older entry matching again.
+_generations: "OrderedDict[str, tuple]" = OrderedDict()
+_counter = itertools.count(1)
+_stats = {"invalidations": 0, "stale": 0}
+
+
+def _generation(subject: str) -> int:
+    entry = _generations.get(subject)
+    return entry[0] if entry else 0
+
+
+def stamp(subjects: Iterable[str]) -> tuple:
+    # taken before the query runs, so a write that lands meanwhile makes the stored entry stale
+    return tuple((subject, _generation(subject)) for subject in subjects)
+
+
+def get_cached_list(key):
+    if not EVENT_LIST_CACHE_ENABLED:
+        return None
+    entry = event_list_cache.get(key)
+    if entry is None:
+        return None
+    body, stamps = entry
+    if any(_generation(subject) != generation for subject, generation in stamps):
+        event_list_cache.pop(key)
+        _stats["stale"] += 1
+        return None
+    return body
+
+
+def set_cached_list(key, body: bytes, stamps: tuple):
+    # a write during the query already made it stale; storing it would also let it
+    # outlive the TTL of the bump that forgets its subject
+    if EVENT_LIST_CACHE_ENABLED and all(_generation(subject) == generation for subject, generation in stamps):
+        event_list_cache.set(key, (body, stamps))
+
+
+def invalidate_lists(subjects: Iterable[str]):
+    now = time.monotonic()
+    for subject in (*subjects, ANY_EVENT):
+        _generations[subject] = (next(_counter), now)
+        _generations.move_to_end(subject)
+    _stats["invalidations"] += 1
+    # without a TTL entries never expire, so neither can the generations they were stamped with
+    if EVENT_LIST_CACHE_TTL_SECONDS > 0:
+        cutoff = now - EVENT_LIST_CACHE_TTL_SECONDS
+        while _generations and next(iter(_generations.values()))[1] < cutoff:
+            _generations.popitem(last=False)
+
+
+def list_cache_stats() -> dict:
+    stats = event_list_cache.stats()
+    # stale entries were found but not served
+    hits, misses = stats["hits"] - _stats["stale"], stats["misses"] + _stats["stale"]
+    return {
+        **stats,
+        "enabled": EVENT_LIST_CACHE_ENABLED,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "subjects": len(_generations),
+        **_stats,
+    }
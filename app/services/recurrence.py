@@ -0,0 +1,97 @@
+"""Expansion of recurring events into the occurrences that fall inside a window.
+
+A series is the stored event row with is_recurring set; its start_time/end_time
+are the first occurrence and reccurrence_pattern is "daily", "weekly" or
+"monthly". Series have no end, so expansion always needs a window.
+"""
+import calendar
+from datetime import datetime, timedelta
+from app.core.config import RECURRENCE_CACHE_MAX_SIZE, RECURRENCE_CACHE_TTL_SECONDS, RECURRENCE_MAX_WINDOW_DAYS
+from app.utils.cache import TTLCache
+
+_STEPS = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+
+# windows cached per series
+_MAX_WINDOWS_PER_EVENT = 16
+
+# event_id -> {"rule": (start_time, pattern), "windows": {(window_start, window_end): [occurrence starts]}}
+# The rule is compared on every read, so a series edited by another worker is
+# recomputed even before this worker's entry is invalidated or expires.
+occurrence_cache = TTLCache(maxsize=RECURRENCE_CACHE_MAX_SIZE, ttl=RECURRENCE_CACHE_TTL_SECONDS)
+
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    # Jan 31 + 1 month -> Feb 28/29; always computed from the first occurrence so days don't drift
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    return moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence_starts(first: datetime, pattern: str, window_start: datetime, window_end: datetime) -> list:
+    """Start times of a series that fall inside [window_start, window_end]."""
+    pattern = (pattern or "").lower()
+    starts = []
+    if pattern in _STEPS:
+        step = _STEPS[pattern]
+        # jump straight to the first occurrence inside the window
+        start = first + max(0, -((first - window_start) // step)) * step
+        while start <= window_end:
+            starts.append(start)
+            start += step
+    elif pattern == "monthly":
+        months = max(0, (window_start.year - first.year) * 12 + window_start.month - first.month - 1)
+        start = _add_months(first, months)
+        while start <= window_end:
+            if start >= window_start:
+                starts.append(start)
+            months += 1
+            start = _add_months(first, months)
+    elif window_start <= first <= window_end:
+        # unknown pattern: the series is just its stored row
+        starts.append(first)
+    return starts
+
+
+def resolve_window(window_start: datetime, window_end: datetime):
+    # open-ended ranges are capped at RECURRENCE_MAX_WINDOW_DAYS
+    span = timedelta(days=RECURRENCE_MAX_WINDOW_DAYS)
+    if window_end is None:
+        window_end = window_start + span
+    if window_start is None or window_end - window_start > span:
+        window_start = window_end - span
+    return window_start, window_end
+
+
+def expand_series(series: dict, window_start: datetime, window_end: datetime) -> list:
+    """Occurrence documents of `series` inside the window, in start_time order.
+
+    Each occurrence is a copy of the series row with shifted start/end times; it
+    keeps the series _id so (start_time, _id) stays a unique sort key.
+    """
+    event_id = str(series["_id"])
+    rule = (series["start_time"], series.get("reccurrence_pattern"))
+    entry = occurrence_cache.get(event_id)
+    if entry is None or entry["rule"] != rule:
+        entry = {"rule": rule, "windows": {}}
+        occurrence_cache.set(event_id, entry)
+
+    windows = entry["windows"]
+    starts = windows.get((window_start, window_end))
+    if starts is None:
+        starts = occurrence_starts(series["start_time"], series.get("reccurrence_pattern"), window_start, window_end)
+        if len(windows) >= _MAX_WINDOWS_PER_EVENT:
+            windows.pop(next(iter(windows)))
+        windows[(window_start, window_end)] = starts
+
+    duration = series["end_time"] - series["start_time"]
+    return [
+        {**series, "start_time": start, "end_time": start + duration, "is_occurrence": True}
+        for start in starts
+    ]
+
+
+def invalidate_occurrences(event_id: str = None):
+    if event_id is None:
+        occurrence_cache.clear()
+    else:
+        occurrence_cache.pop(str(event_id))
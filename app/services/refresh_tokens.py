@@ -0,0 +1,81 @@
+"""Refresh token store.
+
+Tokens are stored under a short hash of the token (never the token itself),
+so lookups hit the _id index with a fixed-size key. Each login starts a token
+family; refreshing revokes the presented token and issues the next one in the
+same family in a single atomic step. Presenting an already revoked token means
+it was copied, so the whole family is revoked. Rows are purged by the TTL index
+on expires_at, revoked or not.
+"""
+import datetime
+import hashlib
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app.utils.jwt import create_refresh_token
+from app.utils.logger import logger
+
+
+class RefreshTokenError(Exception):
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def token_key(token: str) -> str:
+    # 128 bits of sha256 is plenty for a lookup key and keeps the index small
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+async def issue_refresh_token(db, email: str, family: str = None) -> str:
+    token, expires_at = create_refresh_token({"sub": email})
+    await db["refresh_tokens"].insert_one({
+        "_id": token_key(token),
+        "family": family or str(ObjectId()),
+        "email": email,
+        "created_at": datetime.datetime.utcnow(),
+        "expires_at": expires_at,
+        "revoked": False
+    })
+    return token
+
+
+async def _revoke(db, token: str, query: dict):
+    """Atomically revoke a token matching `query`; returns its row as it was, or None."""
+    now = datetime.datetime.utcnow()
+    query = {"revoked": False, **query}
+    update = {"$set": {"revoked": True, "revoked_at": now}}
+    doc = await db["refresh_tokens"].find_one_and_update(
+        {"_id": token_key(token), **query}, update, return_document=ReturnDocument.BEFORE
+    )
+    if doc is None:
+        # rows written before tokens were hashed; they age out through the TTL index
+        doc = await db["refresh_tokens"].find_one_and_update(
+            {"token": token, **query}, update, return_document=ReturnDocument.BEFORE
+        )
+        if doc is not None:
+            doc.setdefault("family", str(doc["_id"]))
+    return doc
+
+
+async def rotate_refresh_token(db, token: str, email: str) -> str:
+    """Revoke `token` and issue its successor; raises RefreshTokenError if it can't be used."""
+    doc = await _revoke(db, token, {"email": email, "expires_at": {"$gt": datetime.datetime.utcnow()}})
+    if doc is not None:
+        return await issue_refresh_token(db, email, doc["family"])
+
+    stale = await db["refresh_tokens"].find_one(
+        {"_id": token_key(token)}, {"family": 1, "revoked": 1, "expires_at": 1}
+    )
+    if stale is None:
+        raise RefreshTokenError("Token not found or already revoked")
+    if stale["revoked"]:
+        result = await db["refresh_tokens"].update_many(
+            {"family": stale["family"], "revoked": False}, {"$set": {"revoked": True}}
+        )
+        logger.warning(f"Refresh token reuse for {email}; revoked {result.modified_count} token(s) in its family")
+        raise RefreshTokenError("Token not found or already revoked")
+    raise RefreshTokenError("Refresh token expired")
+
+
+async def revoke_refresh_token(db, token: str) -> bool:
+    return await _revoke(db, token, {}) is not None
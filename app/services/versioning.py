@@ -0,0 +1,367 @@
+"""Event version storage.
+
+Every version record stores the event as it was *before* a change. In "full"
+mode each record keeps that snapshot in `data`. In "delta" mode only the newest
+record and every VERSION_SNAPSHOT_INTERVAL-th record keep `data`; the others
+are compacted to a reverse `delta` that turns the next record's state (in
+timestamp order) back into their own. Readers go through load_version_data /
+iter_version_states and never need to know which layout a record uses.
+"""
+from datetime import datetime
+from bson import ObjectId
+from pymongo import DESCENDING, ASCENDING, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.core.config import DIFF_DEEPDIFF_COMPAT, VERSION_DIFF_CACHE_SIZE, VERSION_SNAPSHOT_INTERVAL, VERSION_STORAGE_MODE
+from app.utils.cache import TTLCache
+from app.utils.diff import apply_delta, diff_versions, make_delta
+from app.utils.logger import logger
+
+VERSION_ORDER = [("timestamp", ASCENDING), ("_id", ASCENDING)]
+
+# "format:version_id_1:version_id_2" -> diff document; versions never change once written
+version_diff_cache = TTLCache(maxsize=VERSION_DIFF_CACHE_SIZE, ttl=0)
+
+
+class VersionChainError(Exception):
+    pass
+
+
+class VersionWriteError(Exception):
+    pass
+
+
+def _is_periodic_snapshot(seq: int) -> bool:
+    return (seq - 1) % VERSION_SNAPSHOT_INTERVAL == 0
+
+
+def _version_writes(event_id: str, snapshot: dict, changed_by: str, diff, head, extra: dict):
+    if not head:
+        seq = 1
+    elif head.get("seq"):
+        seq = head["seq"] + 1
+    else:
+        # history from before seq existed: continue after it, matching what
+        # migrate_version_storage would number it
+        seq = head["count"] + 1
+    doc = {
+        "event_id": event_id,
+        "seq": seq,
+        "data": snapshot,
+        "diff": diff,
+        "changed_by": changed_by,
+        "timestamp": datetime.utcnow(),
+    }
+    doc.update(extra)
+
+    compaction = None
+    if VERSION_STORAGE_MODE == "delta" and head and head.get("seq") and "data" in head and not _is_periodic_snapshot(head["seq"]):
+        compaction = UpdateOne(
+            {"_id": head["_id"], "data": {"$exists": True}},
+            {"$set": {"delta": make_delta(snapshot, head["data"])}, "$unset": {"data": ""}},
+        )
+    return doc, compaction
+
+
+# concurrent writers of one event race for the next seq; the loser re-reads the head
+_MAX_WRITE_ATTEMPTS = 5
+
+
+def _duplicate_at(exc: BulkWriteError):
+    # index of the op that hit the unique (event_id, seq) index, or None for any other failure
+    errors = exc.details.get("writeErrors") or []
+    if errors and errors[0].get("code") == 11000:
+        return errors[0]["index"]
+    return None
+
+
+async def _head(versions, event_id: str):
+    head = await versions.find_one(
+        {"event_id": event_id},
+        {"seq": 1, "data": 1},
+        sort=[("timestamp", DESCENDING), ("_id", DESCENDING)],
+    )
+    if head and not head.get("seq"):
+        head["count"] = await versions.count_documents({"event_id": event_id})
+    return head
+
+
+async def record_version(db, event_id: str, snapshot: dict, changed_by: str, diff, **extra):
+    """Store `snapshot` (the event before the change) as the newest version.
+
+    The unique (event_id, seq) index makes the head read + insert safe under
+    concurrent updates: only one writer gets seq k+1, so the head is compacted
+    against its real successor; the other retries on top of it.
+    """
+    versions = db["event_versions"]
+    for attempt in range(_MAX_WRITE_ATTEMPTS):
+        head = await _head(versions, event_id)
+        doc, compaction = _version_writes(event_id, snapshot, changed_by, diff, head, extra)
+
+        # insert first: if it fails the previous head must stay a full snapshot
+        ops = [InsertOne(doc)]
+        if compaction:
+            ops.append(compaction)
+        try:
+            await versions.bulk_write(ops, ordered=True)
+            return doc
+        except BulkWriteError as exc:
+            if _duplicate_at(exc) != 0 or attempt == _MAX_WRITE_ATTEMPTS - 1:
+                raise
+            logger.info(f"Version seq {doc['seq']} of event {event_id} taken by a concurrent write, retrying")
+
+
+async def record_change(db, event_id: str, before: dict, written: dict, changed_by: str, diff, **extra):
+    """record_version for a change already written to the event.
+
+    `written` is the $set applied on top of `before`. If the version can't be
+    stored the write is undone (unless the event has been written again since)
+    and VersionWriteError is raised, so no change is left without history.
+    """
+    try:
+        return await record_version(db, event_id, before, changed_by, diff, **extra)
+    except Exception as exc:
+        restore = {key: before[key] for key in written if key in before}
+        drop = {key: "" for key in written if key not in before}
+        update = {"$set": restore, **({"$unset": drop} if drop else {})}
+        result = await db["events"].update_one(
+            {"_id": ObjectId(event_id), "updated_at": written["updated_at"]}, update
+        )
+        if result.matched_count == 0:
+            logger.error(f"Version of event {event_id} not recorded and the event was changed again, not reverting: {exc}")
+        else:
+            logger.error(f"Version of event {event_id} not recorded, change reverted: {exc}")
+        raise VersionWriteError(f"Could not record a version of event {event_id}") from exc
+
+
+async def record_versions(db, entries: list, changed_by: str, **extra):
+    """Bulk form of record_version for (event_id, snapshot, diff) entries of distinct events.
+
+    Looks up every head with one aggregation and writes everything with one
+    bulk_write; entries that lose a seq race are retried the same way.
+    """
+    versions = db["event_versions"]
+    recorded = []
+    for attempt in range(_MAX_WRITE_ATTEMPTS):
+        if not entries:
+            break
+        heads = {}
+        async for head in versions.aggregate([
+            {"$match": {"event_id": {"$in": [event_id for event_id, _, _ in entries]}}},
+            {"$sort": {"event_id": DESCENDING, "timestamp": DESCENDING, "_id": DESCENDING}},
+            {"$group": {"_id": "$event_id", "head_id": {"$first": "$_id"}, "seq": {"$first": "$seq"}, "data": {"$first": "$data"}, "count": {"$sum": 1}}},
+        ]):
+            head["event_id"], head["_id"] = head["_id"], head.pop("head_id")
+            if head.get("data") is None:
+                head.pop("data", None)
+            heads[head["event_id"]] = head
+
+        docs, inserts, compactions = [], [], []
+        for event_id, snapshot, diff in entries:
+            doc, compaction = _version_writes(event_id, snapshot, changed_by, diff, heads.get(event_id), extra)
+            docs.append(doc)
+            inserts.append(InsertOne(doc))
+            compactions.append(compaction)
+
+        try:
+            await versions.bulk_write(inserts + [c for c in compactions if c], ordered=True)
+            return recorded + docs
+        except BulkWriteError as exc:
+            failed = _duplicate_at(exc)
+            # ordered: inserts before `failed` went in, no compaction ran yet
+            if failed is None or failed >= len(inserts) or attempt == _MAX_WRITE_ATTEMPTS - 1:
+                raise
+            done = [c for c in compactions[:failed] if c]
+            if done:
+                await versions.bulk_write(done, ordered=True)
+            recorded += docs[:failed]
+            entries = entries[failed:]
+            logger.info(f"Version seq race on event {entries[0][0]}, retrying {len(entries)} entries")
+    return recorded
+
+
+async def load_version_data(db, version: dict) -> dict:
+    """Return the full event snapshot stored by `version`."""
+    if "delta" not in version:
+        return version.get("data", {})
+
+    deltas = [version["delta"]]
+    later_versions = db["event_versions"].find(
+        {
+            "event_id": version["event_id"],
+            "$or": [
+                {"timestamp": {"$gt": version["timestamp"]}},
+                {"timestamp": version["timestamp"], "_id": {"$gt": version["_id"]}},
+            ],
+        },
+        {"data": 1, "delta": 1},
+    ).sort(VERSION_ORDER).batch_size(VERSION_SNAPSHOT_INTERVAL + 1)
+
+    async for later in later_versions:
+        if "delta" not in later:
+            state = later.get("data", {})
+            for delta in reversed(deltas):
+                state = apply_delta(state, delta)
+            return state
+        deltas.append(later["delta"])
+
+    raise VersionChainError(f"No snapshot found after version {version['_id']}")
+
+
+async def latest_version_id(db, event_id: str):
+    # covered by event_id_timestamp (the planner picks it for this sort): nothing but the index is read
+    doc = await db["event_versions"].find_one(
+        {"event_id": event_id},
+        {"_id": 1},
+        sort=[("event_id", DESCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+    )
+    return doc["_id"] if doc else None
+
+
+async def find_version_after(db, event_id: str, moment: datetime):
+    # the first change after `moment`; its snapshot is the event as it was at `moment`
+    return await db["event_versions"].find_one(
+        {"event_id": event_id, "timestamp": {"$gt": moment}},
+        {"diff": 0},
+        sort=VERSION_ORDER,
+    )
+
+
+async def find_versions_after(db, event_ids: list, moment: datetime) -> dict:
+    """find_version_after for many events at once: event_id -> first version after `moment`.
+
+    One aggregation walking event_id_timestamp; events unchanged since `moment` are absent.
+    """
+    found = {}
+    async for row in db["event_versions"].aggregate([
+        {"$match": {"event_id": {"$in": event_ids}, "timestamp": {"$gt": moment}}},
+        {"$sort": {"event_id": ASCENDING, "timestamp": ASCENDING, "_id": ASCENDING}},
+        {"$group": {"_id": "$event_id", "version": {"$first": "$$ROOT"}}},
+        {"$project": {"version.diff": 0}},
+    ]):
+        found[row["_id"]] = row["version"]
+    return found
+
+
+async def iter_version_states(db, event_id: str, extra_filter: dict = None, projection: dict = None, batch_size: int = 100):
+    """Yield (version, snapshot) pairs in timestamp order.
+
+    At most one snapshot interval of records is buffered, so memory stays flat
+    regardless of how long the history is.
+    """
+    query = {"event_id": event_id}
+    if extra_filter:
+        query.update(extra_filter)
+    cursor = db["event_versions"].find(query, projection).sort(VERSION_ORDER).batch_size(batch_size)
+
+    pending = []
+    async for version in cursor:
+        if "delta" in version:
+            pending.append(version)
+            continue
+
+        state = version.get("data", {})
+        resolved = []
+        for earlier in reversed(pending):
+            state = apply_delta(state, earlier["delta"])
+            resolved.append((earlier, state))
+        for earlier, earlier_state in reversed(resolved):
+            yield earlier, earlier_state
+        pending = []
+        yield version, version.get("data", {})
+
+    if pending:
+        raise VersionChainError(f"No snapshot found after version {pending[-1]['_id']} of event {event_id}")
+
+
+async def get_version_diff(db, event_id: str, version_id_1: str, version_id_2: str):
+    """Diff between two versions of an event, memoized in memory and in event_version_diffs.
+
+    Returns None when either version doesn't exist for this event.
+    """
+    diff_format = "deepdiff" if DIFF_DEEPDIFF_COMPAT else "event"
+    key = f"{diff_format}:{version_id_1}:{version_id_2}"
+
+    cached = version_diff_cache.get(key)
+    if cached is None:
+        cached = await db["event_version_diffs"].find_one({"_id": key})
+        if cached is not None:
+            version_diff_cache.set(key, cached)
+    if cached is not None:
+        return cached if cached["event_id"] == event_id else None
+
+    if not (ObjectId.is_valid(version_id_1) and ObjectId.is_valid(version_id_2)):
+        return None
+    found = {
+        str(version["_id"]): version
+        async for version in db["event_versions"].find(
+            {"_id": {"$in": [ObjectId(version_id_1), ObjectId(version_id_2)]}, "event_id": event_id}
+        )
+    }
+    if version_id_1 not in found or version_id_2 not in found:
+        return None
+
+    doc = {
+        "_id": key,
+        "event_id": event_id,
+        "diff": diff_versions(
+            await load_version_data(db, found[version_id_1]),
+            await load_version_data(db, found[version_id_2]),
+        ),
+        "created_at": datetime.utcnow(),
+    }
+    try:
+        await db["event_version_diffs"].insert_one(doc)
+    except DuplicateKeyError:
+        pass  # computed concurrently by another request
+    version_diff_cache.set(key, doc)
+    return doc
+
+
+async def migrate_version_storage(db, mode: str = VERSION_STORAGE_MODE) -> dict:
+    """Rewrite existing history into the layout of `mode` ("full" or "delta").
+
+    Safe to re-run; only records whose layout changes are written.
+    """
+    versions = db["event_versions"]
+    stats = {"events": 0, "updated": 0}
+
+    for event_id in await versions.distinct("event_id"):
+        history = [item async for item in iter_version_states(db, event_id)]
+        ops, renumbered = [], []
+        for index, (version, state) in enumerate(history):
+            seq = index + 1
+            is_head = index == len(history) - 1
+            if version.get("seq") is not None and version["seq"] != seq:
+                renumbered.append(version["_id"])
+            if mode == "delta" and not is_head and not _is_periodic_snapshot(seq):
+                delta = make_delta(history[index + 1][1], state)
+                if version.get("seq") != seq or version.get("delta") != delta:
+                    ops.append(UpdateOne({"_id": version["_id"]}, {"$set": {"seq": seq, "delta": delta}, "$unset": {"data": ""}}))
+            elif version.get("seq") != seq or "delta" in version:
+                ops.append(UpdateOne({"_id": version["_id"]}, {"$set": {"seq": seq, "data": state}, "$unset": {"delta": ""}}))
+
+        if renumbered:
+            # two phases: rows moving to a seq another row still holds would hit
+            # event_id_seq_unique; without a seq they are outside that (partial) index
+            await versions.update_many({"_id": {"$in": renumbered}}, {"$unset": {"seq": ""}})
+        if ops:
+            await versions.bulk_write(ops, ordered=False)
+            stats["updated"] += len(ops)
+        stats["events"] += 1
+
+    logger.info(f"Migrated event versions to '{mode}' storage: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    # python -m app.services.versioning [full|delta]
+    import asyncio
+    import sys
+    from app.database import connect_db, get_db
+
+    async def _main():
+        await connect_db()
+        mode = sys.argv[1] if len(sys.argv) > 1 else VERSION_STORAGE_MODE
+        print(await migrate_version_storage(get_db(), mode))
+
+    asyncio.run(_main())
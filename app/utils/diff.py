@@ -1,7 +1,76 @@
 from deepdiff import DeepDiff
 import json 
+from app.core.config import DIFF_DEEPDIFF_COMPAT
+from app.schemas.event import EventBase
 
-def diff_versions(old_data: dict, new_data: dict):
+# Fields compared by diff_events; bookkeeping fields (_id, created_by, timestamps) are ignored
+EVENT_DIFF_FIELDS = tuple(EventBase.model_fields) + ("tags",)
+# list fields compared as sets: order doesn't matter, only what was added/removed
+SET_FIELDS = ("tags", "collaborators")
+
+
+def diff_versions(old_data: dict, new_data: dict, compat: bool = DIFF_DEEPDIFF_COMPAT):
+    if compat:
+        return deepdiff_versions(old_data, new_data)
+    return diff_events(old_data, new_data)
+
+
+def deepdiff_versions(old_data: dict, new_data: dict):
+    # previous generic implementation, kept for DeepDiff-shaped output
     diff_obj = DeepDiff(old_data, new_data, ignore_order=True)
     diff = json.loads(diff_obj.to_json())
     return diff
+
+
+def _freeze(value):
+    # hashable, order-insensitive form of nested dicts/lists so they can live in a set
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _set_changes(old_items, new_items):
+    old_frozen = [_freeze(item) for item in old_items]
+    new_frozen = [_freeze(item) for item in new_items]
+    old_keys, new_keys = set(old_frozen), set(new_frozen)
+    added = [item for item, key in zip(new_items, new_frozen) if key not in old_keys]
+    removed = [item for item, key in zip(old_items, old_frozen) if key not in new_keys]
+    return added, removed
+
+
+def diff_events(old_data: dict, new_data: dict) -> dict:
+    """Compact field-level diff of two event documents.
+
+    {"title": {"old": "a", "new": "b"}, "tags": {"added": [...], "removed": [...]}}
+    An empty dict means nothing changed.
+    """
+    changes = {}
+    for field in EVENT_DIFF_FIELDS:
+        if field not in old_data and field not in new_data:
+            continue
+        old_value, new_value = old_data.get(field), new_data.get(field)
+        if field in SET_FIELDS:
+            added, removed = _set_changes(old_value or [], new_value or [])
+            if added or removed:
+                changes[field] = {"added": added, "removed": removed}
+        elif old_value != new_value or (field in old_data) != (field in new_data):
+            changes[field] = {"old": old_value, "new": new_value}
+    return changes
+
+
+# Top-level field delta used for compact version storage.
+# make_delta(source, target) returns what apply_delta needs to turn source into target.
+def make_delta(source: dict, target: dict) -> dict:
+    changed = {key: value for key, value in target.items() if key not in source or source[key] != value}
+    removed = [key for key in source if key not in target]
+    return {"set": changed, "unset": removed}
+
+
+def apply_delta(source: dict, delta: dict) -> dict:
+    result = dict(source)
+    result.update(delta.get("set", {}))
+    for key in delta.get("unset", []):
+        result.pop(key, None)
+    return result
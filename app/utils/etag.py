@@ -0,0 +1,32 @@
+import hashlib
+import hmac
+from typing import Optional
+from fastapi import Response
+from app.utils.jwt import SECRET_KEY
+
+
+def make_etag(*parts) -> str:
+    # keyed, so a 304 confirms nothing to a client that never received the ETag
+    digest = hmac.new(SECRET_KEY.encode(), "|".join(str(part) for part in parts).encode(), hashlib.sha256)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = False) -> bool:
+    """If-None-Match compares weakly (W/ prefixes ignored), If-Match strongly.
+
+    "*" only counts for If-Match: on a read it would confirm the resource exists
+    and hand out its ETag without the client ever having fetched it.
+    """
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if (candidate == "*" and not weak) or candidate == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
+import secrets
 
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
@@ -13,9 +14,11 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7
 #     data.update({"exp": expire, "type": "access"})
 #     return jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
+def create_access_token(data: dict, expires_delta: timedelta | None = None, extra_claims: dict | None = None):
     # print(data)
     claims = {"email": data["sub"],"company":"neofi","developers": "hemantsingh", "iat": datetime.utcnow()}
+    if extra_claims:
+        claims.update(extra_claims)
     to_encode = claims.copy()
     if expires_delta:
         expire_at = datetime.utcnow() + expires_delta
@@ -37,7 +40,8 @@ def create_refresh_token(data: dict):
     # print(data)
     claims = {"email": data["sub"],"company":"neofi","developers": "hemantsingh", "iat": datetime.utcnow()}
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    claims.update({"exp": expire, "type": "refresh"})
+    # jti keeps tokens issued in the same second distinct (they are stored by hash)
+    claims.update({"exp": expire, "type": "refresh", "jti": secrets.token_urlsafe(12)})
     refresh_token = jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
     return refresh_token, expire
 
@@ -0,0 +1,35 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(start_time: datetime, event_id: ObjectId) -> str:
+    # opaque to clients; keyed on the (start_time, _id) sort order
+    raw = json.dumps({"t": start_time.isoformat(), "id": str(event_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"]), ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as exc:
+        raise InvalidCursor(str(exc)) from exc
+
+
+def seek_filter(start_time: datetime, event_id: ObjectId, id_field: str = "_id") -> dict:
+    # everything strictly after (start_time, _id) in ascending order;
+    # id_field is "event_id" when seeking over event_access entries
+    return {
+        "$or": [
+            {"start_time": {"$gt": start_time}},
+            {"start_time": start_time, id_field: {"$gt": event_id}},
+        ]
+    }
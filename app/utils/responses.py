@@ -0,0 +1,29 @@
+import orjson
+from typing import Any
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+# orjson writes datetimes natively, in the same form as datetime.isoformat();
+# non-string dict keys are stringified instead of raising
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def bson_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=bson_default, option=_ORJSON_OPTIONS)
+
+
+class BSONResponse(JSONResponse):
+    """JSON response that serializes Mongo documents (ObjectId, datetime) in one orjson pass.
+
+    Return an instance from the route (not a plain dict) so FastAPI skips
+    jsonable_encoder; declare it as response_class for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,33 @@
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from app.utils.responses import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(records) -> StreamingResponse:
+    # records is an async iterator of dicts; each one becomes a line as soon as it's produced
+    async def body():
+        async for record in records:
+            yield dumps(record) + b"\n"
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def iter_ndjson_lines(request: Request):
+    # yields (line_number, raw_line) from a streamed request body without buffering it whole
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+    if buffer.strip():
+        yield line_number + 1, buffer
@@ -0,0 +1,86 @@
+"""Broadcast latency with hundreds of sockets per event room.
+
+Compares the old sequential `await send_json` loop with CollaborationManager's
+per-connection queues. A few sockets are slow; the numbers reported are how
+long the sender's broadcast() call blocks and when the last fast socket has
+received every message.
+
+    python -m benchmarks.collab_broadcast [sockets] [slow_sockets] [messages]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from app.services.collab import CollaborationManager
+
+SLOW_SEND_SECONDS = 0.05
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+        self.last_received_at = None
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        self.last_received_at = time.perf_counter()
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data))
+
+
+async def sequential_broadcast(sockets, message):
+    # what CollaborationManager.broadcast used to do
+    for websocket in sockets:
+        await websocket.send_json(message)
+
+
+def _make_sockets(count, slow):
+    return [FakeWebSocket(SLOW_SEND_SECONDS if i < slow else 0) for i in range(count)]
+
+
+def _report(name, blocked, sockets, started, messages):
+    fast = [ws for ws in sockets if not ws.delay]
+    delivered = all(ws.received == messages for ws in fast)
+    last_fast = max(ws.last_received_at for ws in fast) - started
+    print(f"{name:<10} sender blocked={blocked * 1000:8.2f}ms  fast sockets done={last_fast * 1000:8.2f}ms  all fast delivered={delivered}")
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    slow = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    messages = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    message = {"type": "edit", "field": "title", "value": "Quarterly planning", "cursor": 42}
+
+    sockets = _make_sockets(count, slow)
+    started = time.perf_counter()
+    for _ in range(messages):
+        await sequential_broadcast(sockets, message)
+    _report("sequential", time.perf_counter() - started, sockets, started, messages)
+
+    manager = CollaborationManager(queue_size=messages)
+    sockets = _make_sockets(count, slow)
+    for websocket in sockets:
+        await manager.connect("room", websocket)
+    started = time.perf_counter()
+    for _ in range(messages):
+        await manager.broadcast("room", message)
+    blocked = time.perf_counter() - started
+    while any(ws.received < messages for ws in sockets if not ws.delay):
+        await asyncio.sleep(0.001)
+    _report("queued", blocked, sockets, started, messages)
+    print("manager stats:", manager.stats)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+"""Micro-benchmark: event-aware diff vs the previous DeepDiff round trip.
+
+    python -m benchmarks.diff_bench [iterations]
+"""
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from app.utils.diff import deepdiff_versions, diff_events
+
+
+def _event(title, shift_hours, collaborators):
+    start = datetime(2025, 3, 10, 9, 0) + timedelta(hours=shift_hours)
+    return {
+        "_id": "65f0c0ffee0000000000abcd",
+        "title": title,
+        "description": "Weekly sync with the platform team. " * 4,
+        "start_time": start,
+        "end_time": start + timedelta(hours=1),
+        "location": "Room 4",
+        "is_recurring": True,
+        "reccurrence_pattern": "weekly",
+        "tags": ["team", "sync", "platform"],
+        "collaborators": [
+            {"email": f"user{i}@neofi.com", "permissions": {"view": True, "edit": i % 2 == 0}}
+            for i in range(collaborators)
+        ],
+        "created_by": "owner@neofi.com",
+        "created_at": datetime(2025, 1, 1),
+        "updated_at": datetime(2025, 3, 1),
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for collaborators in (2, 20):
+        old = _event("Platform sync", 0, collaborators)
+        new = _event("Platform sync (moved)", 2, collaborators)
+        new["collaborators"] = list(reversed(new["collaborators"]))[1:]
+
+        deep = timeit.timeit(lambda: deepdiff_versions(old, new), number=iterations)
+        fast = timeit.timeit(lambda: diff_events(old, new), number=iterations)
+        print(
+            f"collaborators={collaborators:<3} deepdiff={deep / iterations * 1e6:9.1f}us/op  "
+            f"diff_events={fast / iterations * 1e6:7.1f}us/op  speedup={deep / fast:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
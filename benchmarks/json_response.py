@@ -0,0 +1,81 @@
+"""CPU cost of rendering a 100-event list page.
+
+Compares the previous path (convert _id/datetimes in a loop, then FastAPI's
+jsonable_encoder + JSONResponse) with BSONResponse serializing the raw Mongo
+documents in one orjson pass.
+
+    python -m benchmarks.json_response [iterations] [page_size]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.utils.responses import BSONResponse
+
+
+def _event(i):
+    start = datetime(2025, 3, 10, 9, 0) + timedelta(hours=i)
+    return {
+        "_id": ObjectId(),
+        "title": f"Platform sync #{i}",
+        "description": "Weekly sync with the platform team. " * 4,
+        "start_time": start,
+        "end_time": start + timedelta(hours=1),
+        "location": "Room 4",
+        "is_recurring": False,
+        "reccurrence_pattern": "",
+        "collaborators": [
+            {"email": f"user{j}@neofi.com", "permissions": {"view": True, "edit": j % 2 == 0}}
+            for j in range(3)
+        ],
+        "created_by": "owner@neofi.com",
+        "created_at": datetime(2025, 1, 1),
+        "updated_at": datetime(2025, 3, 1),
+    }
+
+
+def legacy_render(rows):
+    # what get_events used to do per request
+    events = []
+    for event in rows:
+        event = dict(event)
+        event["_id"] = str(event["_id"])
+        for field in ["start_time", "end_time", "created_at", "updated_at"]:
+            if field in event and isinstance(event[field], datetime):
+                event[field] = event[field].isoformat()
+        events.append(event)
+    data = {"page": 1, "per_page": len(events), "total_events": 1000, "total_pages": 10, "events": events}
+    return JSONResponse(jsonable_encoder(data)).body
+
+
+def bson_render(rows):
+    data = {"page": 1, "per_page": len(rows), "total_events": 1000, "total_pages": 10, "events": rows}
+    return BSONResponse(data).body
+
+
+def _cpu_per_call(render, rows, iterations):
+    started = time.process_time()
+    for _ in range(iterations):
+        render(rows)
+    return (time.process_time() - started) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rows = [_event(i) for i in range(page_size)]
+
+    legacy = _cpu_per_call(legacy_render, rows, iterations)
+    fast = _cpu_per_call(bson_render, rows, iterations)
+    print(f"{page_size} events/page, {iterations} iterations")
+    print(f"jsonable_encoder + JSONResponse  {legacy * 1000:8.3f} ms CPU/request")
+    print(f"BSONResponse (orjson)            {fast * 1000:8.3f} ms CPU/request  ({legacy / fast:.1f}x less)")
+    print(f"response bytes: {len(legacy_render(rows))} vs {len(bson_render(rows))}")
+
+
+if __name__ == "__main__":
+    main()
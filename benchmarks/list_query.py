@@ -0,0 +1,96 @@
+"""Latency of one GET /api/events page: find + count_documents vs one $facet.
+
+Needs a running MongoDB (MONGO_URL). Seeds a scratch database with N events
+for a single user, for each N given, and drops it afterwards.
+
+    python -m benchmarks.list_query [pages] [events_per_user ...]
+    python -m benchmarks.list_query 200 10000 100000
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.api.events import EVENT_LIST_SORT, _facet_page
+
+USER = "owner@neofi.com"
+PER_PAGE = 10
+BENCH_DB = "neofi_list_query_bench"
+
+
+async def _seed(collection, count):
+    await collection.drop()
+    await collection.create_index([("created_by", 1), ("start_time", 1), ("_id", 1)])
+    await collection.create_index([("collaborators.user_id", 1), ("start_time", 1), ("_id", 1)])
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(count):
+        begins = start + timedelta(minutes=30 * i)
+        batch.append({
+            "title": f"Event {i}",
+            "description": "Weekly sync with the platform team. " * 4,
+            "start_time": begins,
+            "end_time": begins + timedelta(minutes=30),
+            "location": "Room 4",
+            "collaborators": [],
+            "created_by": USER,
+            "created_at": start,
+            "updated_at": start,
+        })
+        if len(batch) == 5000:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+
+
+async def _two_queries(collection, filters, skip):
+    rows = await collection.find(filters).sort(EVENT_LIST_SORT).skip(skip).limit(PER_PAGE).to_list(length=PER_PAGE)
+    total = await collection.count_documents(filters)
+    return rows, total
+
+
+async def _facet(collection, filters, skip):
+    return await _facet_page(collection, filters, filters, skip, PER_PAGE)
+
+
+async def _time(fn, collection, filters, pages, total_pages):
+    latencies = []
+    for i in range(pages):
+        skip = (i * 7919 % total_pages) * PER_PAGE  # spread over shallow and deep pages
+        started = time.perf_counter()
+        await fn(collection, filters, skip)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def _report(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"  {name:<22} median={statistics.median(latencies) * 1000:8.2f}ms  p95={p95 * 1000:8.2f}ms")
+
+
+async def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sizes = [int(arg) for arg in sys.argv[2:]] or [10000, 100000]
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    collection = client[BENCH_DB]["events"]
+    filters = {"$or": [{"created_by": USER}, {"collaborators.user_id": USER}]}
+    try:
+        for size in sizes:
+            await _seed(collection, size)
+            total_pages = max(1, size // PER_PAGE)
+            print(f"{size} events/user, {pages} page requests")
+            _report("find + count_documents", await _time(_two_queries, collection, filters, pages, total_pages))
+            _report("$facet", await _time(_facet, collection, filters, pages, total_pages))
+    finally:
+        await client.drop_database(BENCH_DB)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
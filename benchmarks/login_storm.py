@@ -0,0 +1,79 @@
+"""Event-loop latency of unrelated requests during a login storm.
+
+Compares the old path (bcrypt verify called directly inside the async
+handler) with verify_password_async, which runs bcrypt on the hashing pool.
+A probe coroutine stands in for an unrelated endpoint and is timed every
+few milliseconds while the logins run.
+
+    python -m benchmarks.login_storm [logins] [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from app.core.security import (
+    get_hashing_stats,
+    get_password_hash,
+    verify_password,
+    verify_password_async,
+)
+
+PASSWORD = "owner@123"
+PROBE_INTERVAL = 0.005
+
+
+async def _unrelated_endpoint():
+    await asyncio.sleep(0)
+    return {"status": "healthy"}
+
+
+async def _probe(latencies, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.create_task(_unrelated_endpoint())
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def _storm(login, hashed, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            assert await login(PASSWORD, hashed)
+
+    await asyncio.gather(*(one() for _ in range(logins)))
+
+
+async def _blocking_login(plain, hashed):
+    return verify_password(plain, hashed)
+
+
+async def run(name, login, hashed, logins, concurrency):
+    latencies, stop = [], asyncio.Event()
+    probe = asyncio.create_task(_probe(latencies, stop))
+    started = time.perf_counter()
+    await _storm(login, hashed, logins, concurrency)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if len(latencies) > 1 else latencies[0] * 1000
+    print(f"{name:<10} logins/s={logins / elapsed:7.1f}  unrelated p50={p50:7.2f}ms  p99={p99:7.2f}ms  samples={len(latencies)}")
+
+
+async def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    hashed = get_password_hash(PASSWORD)
+
+    await run("blocking", _blocking_login, hashed, logins, concurrency)
+    await run("offloaded", verify_password_async, hashed, logins, concurrency)
+    print("hashing pool:", get_hashing_stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())